@@ -3,6 +3,8 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import SystemMessage, AIMessage, HumanMessage, ToolMessage
 from langchain_core.tools import tool
 from models import AgentState
+import asyncio
+import logging
 import os
 from dotenv import load_dotenv
 from bson import ObjectId
@@ -10,22 +12,44 @@ from bson import ObjectId
 # Load environment variables first
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Cap when materializing a project's task list; keeps memory bounded if the
+# collection ever grows well beyond a learning project's usual size
+_MAX_PROJECT_TASKS = 500
+
+
+def _normalize_goals(goals_data) -> list:
+    """Flatten whatever shape the stored goals field has (str, list, other)
+    into a clean list of non-empty strings in a single pass."""
+    if not goals_data:
+        return []
+    items = goals_data if isinstance(goals_data, list) else [goals_data]
+    return [
+        s for s in
+        ((x if isinstance(x, str) else str(x)).strip() for x in items if x)
+        if s
+    ]
+
 
 def get_learning_agent(db):
     api_key = os.getenv("GOOGLE_API_KEY")
     if not api_key:
         raise ValueError("GOOGLE_API_KEY not found in environment variables")
 
-    print(f"🔑 Using API Key: {api_key[:10]}...")
+    logger.debug("🔑 Using API Key: %s...", api_key[:10])
 
-    # Use gemini-2.5-flash with tools
+    # Use gemini-2.5-flash with tools. Tool routing and the 3-title list
+    # are deterministic - temperature 0 cuts retry iterations from
+    # tool-argument typos, and the cap bounds decode time
     llm = ChatGoogleGenerativeAI(
         model="gemini-2.5-flash",
-        temperature=0.7,
+        temperature=0.0,
+        max_output_tokens=512,
         google_api_key=api_key
     )
 
-    print("✅ LLM initialized with model: gemini-2.5-flash")
+    logger.debug("✅ LLM initialized with model: gemini-2.5-flash")
 
     # Define tools for the agent
     @tool
@@ -40,7 +64,10 @@ def get_learning_agent(db):
             Dictionary with project details
         """
         try:
-            project = await db.projects.find_one({"_id": ObjectId(project_id)})
+            project = await db.projects.find_one(
+                {"_id": ObjectId(project_id)},
+                {"name": 1, "description": 1, "status": 1, "created_at": 1}
+            )
             if not project:
                 return {"error": f"Project {project_id} not found"}
             
@@ -66,8 +93,11 @@ def get_learning_agent(db):
             List of tasks with their details
         """
         try:
-            tasks_cursor = db.tasks.find({"project_id": project_id})
-            tasks = await tasks_cursor.to_list(length=None)
+            tasks_cursor = db.tasks.find(
+                {"project_id": project_id},
+                {"title": 1, "status": 1, "assigned_to": 1}
+            )
+            tasks = await tasks_cursor.to_list(length=_MAX_PROJECT_TASKS)
             
             return [
                 {
@@ -81,34 +111,6 @@ def get_learning_agent(db):
         except Exception as e:
             return [{"error": str(e)}]
 
-    @tool
-    async def get_user_goals(user_id: str) -> dict:
-        """
-        Fetch the learning goals for a specific user.
-        
-        Args:
-            user_id: The user ID to fetch goals for
-            
-        Returns:
-            Dictionary with user goals
-        """
-        try:
-            goals_doc = await db.goals.find_one({"userId": user_id})
-            if not goals_doc:
-                return {"goals": [], "message": "No goals set"}
-            
-            goals_data = goals_doc.get("goals", [])
-            if isinstance(goals_data, str):
-                goals = [goals_data] if goals_data.strip() else []
-            elif isinstance(goals_data, list):
-                goals = goals_data
-            else:
-                goals = []
-                
-            return {"goals": goals}
-        except Exception as e:
-            return {"error": str(e)}
-
     @tool
     async def assign_task_to_user(user_id: str, task_id: str) -> dict:
         """
@@ -142,50 +144,42 @@ def get_learning_agent(db):
         except Exception as e:
             return {"error": str(e)}
 
-    # Bind tools to LLM
-    tools = [get_project_details, get_project_tasks, get_user_goals, assign_task_to_user]
+    # Bind tools to LLM. get_user_goals is deliberately absent: goals are
+    # fetched once in the supervisor node and inlined into the prompt, so a
+    # bound goals tool would only invite a redundant Mongo round trip.
+    tools = [get_project_details, get_project_tasks, assign_task_to_user]
+    tool_by_name = {t.name: t for t in tools}
     llm_with_tools = llm.bind_tools(tools)
 
-    async def analyze_state(state: AgentState):
-        """Supervisor Node: Analyzes user state and fetches goals"""
-        user_id = state["userId"]
-        goals_doc = await db.goals.find_one({"userId": user_id})
-
-        # Handle goals - can be either string or list from backend
-        goals = []
-        if goals_doc and "goals" in goals_doc:
-            goals_data = goals_doc["goals"]
-            if isinstance(goals_data, str):
-                goals = [goals_data] if goals_data.strip() else []
-            elif isinstance(goals_data, list):
-                goals = goals_data
-            else:
-                goals = []
-
-        print(f"📊 Analyzed state for user: {user_id}")
-        print(f"   Goals parsed: {goals}")
-
-        return {
-            "goals": goals,
-            "active_task": None
-        }
-
     def check_goals(state: AgentState) -> str:
         """Conditional routing: Check if user has goals"""
         goals = state.get('goals', [])
-        
+
         if not goals or len(goals) == 0:
-            print("⚠️ No goals found - routing to no_goals")
+            logger.debug("⚠️ No goals found - routing to no_goals")
             return "without_goals"
         else:
-            print(f"✅ Found {len(goals)} goal(s) - routing to agent")
+            logger.debug("✅ Found %d goal(s) - routing to agent", len(goals))
             return "with_goals"
 
-    async def call_agent(state: AgentState):
-        """Agent node: LLM decides which tools to use"""
+    async def supervisor(state: AgentState):
+        """Supervisor node: fetches goals and builds the agent prompt.
+
+        Formerly two nodes (analyze_state then call_agent); merged so the
+        graph pays one state-serialization transition instead of two.
+        """
         user_id = state["userId"]
-        goals = state.get('goals', [])
-        
+        goals_doc = await db.goals.find_one({"userId": user_id})
+
+        # Goals can be stored as either string or list from the backend
+        goals = _normalize_goals(goals_doc.get("goals") if goals_doc else None)
+
+        logger.debug("📊 Analyzed state for user: %s (%d goals)", user_id, len(goals))
+
+        if not goals:
+            # Routed straight to no_goals - no prompt needed
+            return {"goals": goals, "active_task": None}
+
         # Format goals
         if len(goals) == 1:
             goal_text = goals[0]
@@ -225,17 +219,17 @@ Fetch project and tasks for "695caa41c485455f397017ae", identify the top 3 tasks
             HumanMessage(content=user_prompt)
         ] + messages
 
-        print(f"🤖 Agent starting with {len(tools)} tools available...")
+        logger.debug("🤖 Agent starting with %d tools available...", len(tools))
 
-        return {"messages": messages}
+        return {"goals": goals, "active_task": None, "messages": messages}
 
     async def call_model(state: AgentState):
         """Call LLM with tools"""
         messages = state["messages"]
         
-        print(f"💭 Calling LLM with {len(messages)} messages...")
+        logger.debug("💭 Calling LLM with %d messages...", len(messages))
         response = await llm_with_tools.ainvoke(messages)
-        print(f"📝 LLM response type: {type(response)}")
+        logger.debug("📝 LLM response type: %s", type(response))
         
         return {"messages": [response]}
 
@@ -244,43 +238,41 @@ Fetch project and tasks for "695caa41c485455f397017ae", identify the top 3 tasks
         messages = state["messages"]
         last_message = messages[-1]
         
-        print(f"🔧 Checking for tool calls...")
+        logger.debug("🔧 Checking for tool calls...")
         
         if not hasattr(last_message, 'tool_calls') or not last_message.tool_calls:
-            print("   No tool calls found")
+            logger.debug("   No tool calls found")
             return {"messages": []}
         
-        print(f"   Found {len(last_message.tool_calls)} tool call(s)")
+        logger.debug("   Found %d tool call(s)", len(last_message.tool_calls))
         
-        tool_messages = []
+        # The calls in one LLM turn are independent Mongo I/O - execute them
+        # concurrently so the node takes the slowest call, not the sum
+        calls = []
         for tool_call in last_message.tool_calls:
-            tool_name = tool_call["name"]
-            tool_args = tool_call["args"]
-            tool_id = tool_call["id"]
-            
-            print(f"   Executing: {tool_name}({tool_args})")
-            
-            # Find and execute the tool
-            tool_func = None
-            for t in tools:
-                if t.name == tool_name:
-                    tool_func = t
-                    break
-            
+            tool_func = tool_by_name.get(tool_call["name"])
             if tool_func:
-                result = await tool_func.ainvoke(tool_args)
-                print(f"   ✅ Result: {str(result)[:100]}...")
-                
-                tool_messages.append(
-                    ToolMessage(
-                        content=str(result),
-                        tool_call_id=tool_id,
-                        name=tool_name
-                    )
-                )
+                logger.debug("   Executing: %s(%s)", tool_call["name"], tool_call["args"])
+                calls.append((tool_call, tool_func))
             else:
-                print(f"   ❌ Tool {tool_name} not found")
-        
+                logger.warning("   ❌ Tool %s not found", tool_call["name"])
+
+        results = await asyncio.gather(
+            *(tool_func.ainvoke(tool_call["args"]) for tool_call, tool_func in calls),
+            return_exceptions=True
+        )
+
+        tool_messages = []
+        for (tool_call, _), result in zip(calls, results):
+            logger.debug("   ✅ Result: %.100s...", str(result))
+            tool_messages.append(
+                ToolMessage(
+                    content=str(result),
+                    tool_call_id=tool_call["id"],
+                    name=tool_call["name"]
+                )
+            )
+
         return {"messages": tool_messages}
 
     def should_continue(state: AgentState) -> str:
@@ -290,11 +282,11 @@ Fetch project and tasks for "695caa41c485455f397017ae", identify the top 3 tasks
         
         # If LLM made tool calls, continue to execute them
         if hasattr(last_message, 'tool_calls') and last_message.tool_calls:
-            print("🔄 Tool calls detected, continuing to execute_tools")
+            logger.debug("🔄 Tool calls detected, continuing to execute_tools")
             return "continue"
         
         # Otherwise, we're done
-        print("✅ No more tool calls, finishing")
+        logger.debug("✅ No more tool calls, finishing")
         return "end"
 
     async def format_response(state: AgentState):
@@ -311,7 +303,7 @@ Fetch project and tasks for "695caa41c485455f397017ae", identify the top 3 tasks
         if not response_content:
             response_content = "I've analyzed your goals and project, but couldn't generate a proper response."
         
-        print(f"📊 Final response: {response_content[:100]}...")
+        logger.debug("📊 Final response: %.100s...", response_content)
         
         # Return only response_text, excluding messages and other debug info
         return {
@@ -326,7 +318,7 @@ Fetch project and tasks for "695caa41c485455f397017ae", identify the top 3 tasks
             "You can do this by using the goals endpoint to define what you want to achieve!"
         )
         
-        print("📝 Returning no goals message")
+        logger.debug("📝 Returning no goals message")
         
         # Return only response_text, excluding messages
         return {
@@ -337,8 +329,7 @@ Fetch project and tasks for "695caa41c485455f397017ae", identify the top 3 tasks
     workflow = StateGraph(AgentState)
     
     # Add nodes
-    workflow.add_node("supervisor", analyze_state)
-    workflow.add_node("agent", call_agent)
+    workflow.add_node("supervisor", supervisor)
     workflow.add_node("call_model", call_model)
     workflow.add_node("execute_tools", execute_tools)
     workflow.add_node("format_response", format_response)
@@ -347,19 +338,17 @@ Fetch project and tasks for "695caa41c485455f397017ae", identify the top 3 tasks
     # Set entry point
     workflow.set_entry_point("supervisor")
     
-    # Add conditional edge from supervisor
+    # Add conditional edge from supervisor (which also builds the prompt,
+    # so the with_goals branch goes straight to the model)
     workflow.add_conditional_edges(
         "supervisor",
         check_goals,
         {
             "without_goals": "no_goals",
-            "with_goals": "agent"
+            "with_goals": "call_model"
         }
     )
-    
-    # Agent workflow
-    workflow.add_edge("agent", "call_model")
-    
+
     # Add conditional edge after model call
     workflow.add_conditional_edges(
         "call_model",
@@ -377,5 +366,5 @@ Fetch project and tasks for "695caa41c485455f397017ae", identify the top 3 tasks
     workflow.add_edge("format_response", END)
     workflow.add_edge("no_goals", END)
 
-    print("🔄 Agentic workflow compiled successfully with tool support")
+    logger.debug("🔄 Agentic workflow compiled successfully with tool support")
     return workflow.compile()
\ No newline at end of file
@@ -1,78 +1,498 @@
 from langchain_google_genai import ChatGoogleGenerativeAI
 
+from langchain_core.caches import InMemoryCache
+from langchain_core.globals import set_llm_cache
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.tools import tool
 from langgraph.prebuilt import create_react_agent
 from langsmith import traceable
 
+import asyncio
+import functools
+import hashlib
+import logging
 import os
+import types
+from contextvars import ContextVar
+from cachetools import TTLCache
 from dotenv import load_dotenv
 from bson import ObjectId
+from pydantic import BaseModel
 import json
 import re
 
+# orjson parses the LLM JSON several times faster than the stdlib; fall back
+# to json when it isn't installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Load environment variables
 load_dotenv()
 
+# Export LangSmith trace spans from a background worker instead of
+# serializing inputs/outputs on the event loop; .env can still override
+os.environ.setdefault("LANGCHAIN_CALLBACKS_BACKGROUND", "true")
+
+# Read once at import - the process must be restarted to pick up a new key
+# (standard 12-factor behavior). Validated when the LLM is first built so the
+# API can still boot and serve non-agent endpoints without it.
+_GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+
+# Optional name of a pre-created Gemini CachedContent holding the static
+# system prompt (e.g. "cachedContents/abc123"); see _get_llm
+_GEMINI_CACHED_CONTENT = os.getenv("GEMINI_CACHED_CONTENT")
+
+# Gated module logger - verbose diagnostics only run when DEBUG is enabled,
+# so production pays no string-formatting or stdout cost on the hot path.
+logger = logging.getLogger(__name__)
+
+# The single project this deployment assigns tasks from. Parsed to an
+# ObjectId once at import instead of per request.
+PROJECT_ID = "695caa41c485455f397017ae"
+PROJECT_OID = ObjectId(PROJECT_ID)
+
+
+# Precompiled message-dispatch patterns - one scan over the message instead
+# of a .lower() allocation plus several substring passes per request.
+_TASK_MODE_RE = re.compile(
+    r"updated the goals|share (the revised )?tasks", re.IGNORECASE
+)
+# Prefix of the deterministic agent-name-update message. str.removeprefix /
+# str.startswith against this constant replaces the old regex match - a
+# single C-level call with no pattern machinery.
+_NAME_UPDATE_PREFIX = "Updated the name of the agent to "
+
+def _strip_markdown_fences(text: str) -> str:
+    """Strip a leading ```json / ``` fence and a trailing ``` fence.
+
+    The fences are fixed literals, so startswith/endswith plus slicing
+    (single memcmp + slice each) beats running a regex engine over the
+    whole response.
+    """
+    if text.startswith("```json"):
+        text = text[7:].lstrip()
+    elif text.startswith("```"):
+        text = text[3:].lstrip()
+    if text.endswith("```"):
+        text = text[:-3].rstrip()
+    return text
+
 
-async def handle_agent_name_update(db, user_id: str, message: str) -> str:
+def _extract_json_array(text: str):
     """
-    Handle agent name update messages.
-    Extracts the agent name from the message and returns a personalized greeting.
+    Find the first complete JSON array in text with a single O(n) scan.
 
-    Expected message format: "Updated the name of the agent to <agent_name>"
-    Returns: "Hello! I'm <agent_name>. How can I help you today?"
+    Tracks bracket depth plus string/escape state, so brackets inside quoted
+    strings don't confuse it - unlike a greedy regex, which also backtracks
+    badly on malformed output.
     """
-    try:
-        print(f"🔄 Processing agent name update for user: {user_id}")
-        print(f"📝 Message: {message}")
+    start = text.find("[")
+    if start < 0:
+        return None
+
+    depth = 0
+    in_string = False
+    escape = False
+
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "[":
+            depth += 1
+        elif ch == "]":
+            depth -= 1
+            if depth == 0:
+                return text[start : i + 1]
+
+    return None
+
+
+# Responses larger than this are never a 6-task array - refuse to scan them
+# so a runaway LLM response can't stall the event loop in string work
+_MAX_PARSE_LEN = 256 * 1024
+
+_JSON_DECODER = json.JSONDecoder()
+
+
+def _raw_decode_array(text: str):
+    """
+    Fallback extraction: parse exactly one JSON value at each '[' position
+    with json.JSONDecoder.raw_decode, which needs no enclosing regex and
+    never backtracks. Returns the first list found, or None.
+    """
+    idx = text.find("[")
+    while idx >= 0:
+        try:
+            value, _ = _JSON_DECODER.raw_decode(text, idx)
+        except ValueError:
+            pass
+        else:
+            if isinstance(value, list):
+                return value
+        idx = text.find("[", idx + 1)
+    return None
+
 
-        # Extract agent name from the message
-        # Format: "Updated the name of the agent to <agent_name>"
-        prefix = "Updated the name of the agent to "
+def _normalize_goals(goals_data) -> list:
+    """Coerce a stored goals field (str, list, or other) into a clean list[str]."""
+    if isinstance(goals_data, str):
+        return [goals_data.strip()] if goals_data.strip() else []
+    if isinstance(goals_data, list):
+        return [str(g).strip() for g in goals_data if g and str(g).strip()]
+    return [str(goals_data)] if goals_data else []
 
-        if message.startswith(prefix):
-            agent_name = message[len(prefix) :].strip()
-            print(f"✅ Extracted agent name: {agent_name}")
 
-            # Create personalized greeting
-            greeting = f"Hello! I'm {agent_name}. How can I help you today?"
-            print(f"💬 Generated greeting: {greeting}")
+def _flatten_content(content) -> str:
+    """
+    Flatten Gemini message content (a string, or a list of parts) into a
+    single string, short-circuiting the common all-string case.
+    """
+    if isinstance(content, list):
+        if all(isinstance(part, str) for part in content):
+            return "".join(content).strip()
+        return "".join(
+            part if isinstance(part, str) else getattr(part, "text", None) or str(part)
+            for part in content
+        ).strip()
+    return content if isinstance(content, str) else str(content)
+
+# Ephemeral cache of parsed goals by userId. The agent asks for goals on
+# essentially every turn, but goals rarely change within a session - a short
+# TTL skips the Mongo round-trip on repeats. TTLCache expires and evicts
+# internally, so the key space stays bounded in a long-running process.
+_GOALS_TTL = 60  # seconds
+_GOALS_CACHE = TTLCache(maxsize=10_000, ttl=_GOALS_TTL)
+
+
+def invalidate_goals_cache(user_id: str):
+    """Drop the cached goals for a user. Called from goal-update endpoints."""
+    _GOALS_CACHE.pop(user_id, None)
+
+
+# In-process TTL cache for agent names by userId. Saves one Mongo
+# round-trip per agent invocation on cache hit.
+_AGENT_NAME_TTL = 300  # seconds
+_AGENT_NAME_CACHE = TTLCache(maxsize=10_000, ttl=_AGENT_NAME_TTL)
+
+
+# Static system prompt bodies, hoisted to module scope. They contain no
+# interpolation at all - every per-user value (agent name, user id) lives in
+# the HumanMessage - so providers with automatic prompt-prefix caching
+# (Gemini) see a byte-identical system message across requests and users.
+_TASK_SELECT_SYSTEM_PROMPT = """You are an expert learning path advisor.
+
+You will receive a JSON object with the user's goals and candidate_tasks - the project tasks NOT yet assigned to the user.
+
+CRITICAL INSTRUCTION: You MUST ONLY select tasks from candidate_tasks. Do NOT make up or create new tasks.
+
+STEPS TO FOLLOW:
+1. Read the user's goals and the candidate_tasks list
+2. Select EXACTLY 6 candidate tasks that best match the user's goals
+3. Return ONLY those 6 tasks in JSON format
+
+ABSOLUTE RULES - NEVER VIOLATE:
+❌ DO NOT create fictional tasks (e.g., "Quantum Computing" if not in candidate_tasks)
+❌ DO NOT modify task IDs
+✅ ONLY use task IDs EXACTLY as given in candidate_tasks
+✅ Return exactly 6 tasks
+
+OUTPUT FORMAT - RESPOND WITH ONLY THIS JSON (IDs only, no titles):
+[
+{"id": "actual_task_id_from_project"},
+{"id": "actual_task_id_from_project"},
+{"id": "actual_task_id_from_project"},
+{"id": "actual_task_id_from_project"},
+{"id": "actual_task_id_from_project"},
+{"id": "actual_task_id_from_project"}
+]
+
+NO markdown, NO explanation, NO other text - ONLY the JSON array."""
+
+_CHAT_SYSTEM_PROMPT_STATIC = """You are a friendly and knowledgeable career advisor specializing in AI/ML, Data Science, and tech careers.
+
+YOUR EXPERTISE:
+- Career roadmaps (AI/ML, Data Science, Software Engineering)
+- Learning paths and skill development
+- Industry trends and job market insights
+- Project recommendations
+- Resume and interview guidance
+- Career transitions and upskilling
+
+CONVERSATION STYLE:
+- Warm, encouraging, and professional
+- Provide specific, actionable advice
+- Use examples and real-world insights
+- Be honest about timelines and effort required
+
+BOUNDARIES:
+You can answer questions about:
+✅ Career paths in tech (AI/ML, Data Science, Software Engineering)
+✅ Learning roadmaps and skill development
+✅ Project ideas and portfolio building
+✅ Industry trends and job opportunities
+✅ Interview preparation and resume tips
+✅ Course and certification recommendations
+
+For questions OUTSIDE these topics (personal problems, non-tech careers, medical/legal advice, etc.):
+❌ Politely decline, introduce yourself by name, say you are focused on tech career growth, and for other matters refer the user to Vijender P at support@alumnx.com
+
+IMPORTANT:
+- Use get_user_goals tool to understand user's current goals
+- Reference their goals in your advice when relevant
+- Keep responses concise (2-3 paragraphs max)
+- End with a follow-up question to continue the conversation"""
+
+
+# Per-user prompt templates, formatted with str.format_map at request time so
+# the large literals above are allocated once at import, not per call.
+_CHAT_USER_PROMPT_TEMPLATE = """Your name is {agent_name}.
+
+User message: {user_message}
+
+User ID: {user_id}
+
+Please respond to the user's question. First, fetch their learning goals to provide personalized advice."""
+
+_CHAT_WELCOME_PROMPT_TEMPLATE = """Your name is {agent_name}.
+
+User ID: {user_id}
+
+The user has just updated their goals. Fetch their goals and provide an encouraging welcome message about their learning journey."""
+
+
+# The tools are module-level (so their pydantic schemas are built once, not on
+# every request) and read the database handle from a ContextVar that
+# run_learning_agent sets before invoking the agent.
+_DB_CTX: ContextVar = ContextVar("learning_agent_db")
+
+
+@tool
+async def get_user_goals(user_id: str) -> dict:
+    """Fetch the learning goals for a specific user."""
+    db = _DB_CTX.get()
+    try:
+        cached = _GOALS_CACHE.get(user_id)
+        if cached is not None:
+            logger.debug("⚡ Goals cache hit for user: %s", user_id)
+            return cached
+
+        logger.debug("🔍 Fetching goals for user: %s", user_id)
+        goals_doc = await db.goals.find_one({"userId": user_id}, {"goals": 1})
+        if not goals_doc:
+            return {"goals": [], "message": "No goals set"}
+
+        goals_data = goals_doc.get("goals", [])
+        logger.debug("   Raw goals_data type: %s", type(goals_data))
+
+        # Robust parsing - fast path for the common clean list[str] case,
+        # generic fallback for anything else
+        if isinstance(goals_data, list) and all(
+            isinstance(item, str) for item in goals_data
+        ):
+            goals = [item for item in goals_data if item.strip()]
+
+        elif isinstance(goals_data, list):
+            goals = list(
+                filter(None, (str(item).strip() for item in goals_data if item))
+            )
+
+        elif isinstance(goals_data, str):
+            goals = [goals_data.strip()] if goals_data.strip() else []
 
-            return greeting
         else:
-            print("⚠️ Message format didn't match expected pattern")
-            return "Hello! How can I help you today?"
+            goals = [str(goals_data)] if goals_data else []
+
+        logger.debug("✅ Parsed %s goal(s): %s", len(goals), goals)
+        result = {"goals": goals}
+        _GOALS_CACHE[user_id] = result
+        return result
 
     except Exception as e:
-        print(f"❌ Error in handle_agent_name_update: {str(e)}")
-        import traceback
+        logger.exception("❌ Error in get_user_goals")
+        return {"error": str(e)}
+
+
+# Tools bound to the conversational ReAct agent. Task-assignment mode runs a
+# deterministic pipeline in run_learning_agent and needs no agent at all.
+_CHAT_MODE_TOOLS = [get_user_goals]
+
+# Process-wide LLM + agent singletons. Tool binding and graph compilation are
+# not cheap, so build each agent once per process instead of per request.
+_LLM = None
+
+
+def _get_llm():
+    """Create the shared ChatGoogleGenerativeAI instance on first use."""
+    global _LLM
+    if _LLM is None:
+        if not _GOOGLE_API_KEY:
+            raise ValueError("GOOGLE_API_KEY not found")
+
+        # Short-circuit byte-identical repeat calls (welcome messages, the
+        # fixed "updated goals" flows) at the LangChain layer: the cache keys
+        # on (model, params, prompt) so a repeat costs a dict lookup instead
+        # of a Gemini round trip. Set LLM_RESPONSE_CACHE=0 to disable.
+        if os.getenv("LLM_RESPONSE_CACHE", "1") != "0":
+            set_llm_cache(InMemoryCache())
+            logger.debug("✅ LLM response cache enabled")
+
+        llm_kwargs = {
+            "model": "gemini-2.0-flash-exp",
+            "temperature": 0.7,
+            "google_api_key": _GOOGLE_API_KEY,
+        }
+
+        # Optional explicit Gemini context caching: point this at a
+        # CachedContent name (cachedContents/...) created from the static
+        # system prompt to stop paying full price for the shared prefix.
+        # Without it Gemini still applies implicit prefix caching, which the
+        # static-first prompt layout here is already shaped for.
+        if _GEMINI_CACHED_CONTENT:
+            llm_kwargs["cached_content"] = _GEMINI_CACHED_CONTENT
+
+        _LLM = ChatGoogleGenerativeAI(**llm_kwargs)
+        logger.debug("✅ LLM initialized")
+    return _LLM
+
+
+class _TaskPick(BaseModel):
+    """One selected task - the model only ever returns ids."""
+    id: str
+
+
+class _TaskSelection(BaseModel):
+    """Schema bound to the task-selection call via with_structured_output."""
+    tasks: list[_TaskPick]
+
+
+@functools.lru_cache(maxsize=1)
+def _get_selection_llm():
+    """Return the shared LLM with the task-selection schema bound."""
+    return _get_llm().with_structured_output(_TaskSelection)
+
 
-        traceback.print_exc()
+@functools.lru_cache(maxsize=1)
+def _get_chat_agent():
+    """Return the prebuilt conversational ReAct agent."""
+    agent = create_react_agent(_get_llm(), _CHAT_MODE_TOOLS)
+    logger.debug("✅ Chat agent created")
+    return agent
+
+
+def _build_chat_prompts(agent_name: str, user_id: str, user_message: str = None):
+    """Build the (system, user) prompt pair for conversational mode."""
+    # The system message is a shared constant; everything per-user (agent
+    # name, user id, message) goes into the HumanMessage
+    system_prompt = _CHAT_SYSTEM_PROMPT_STATIC
+
+    if user_message:
+        user_prompt = _CHAT_USER_PROMPT_TEMPLATE.format_map(
+            {"agent_name": agent_name, "user_message": user_message, "user_id": user_id}
+        )
+    else:
+        user_prompt = _CHAT_WELCOME_PROMPT_TEMPLATE.format_map(
+            {"agent_name": agent_name, "user_id": user_id}
+        )
+
+    return system_prompt, user_prompt
+
+
+# Execution cache for task-assignment runs. The task-assignment prompt is
+# deterministic given the user's goals, assigned tasks, and the project's task
+# set, so identical re-runs can skip the whole ReAct loop (and every LLM call).
+# The key hashes all of those inputs, so any goals/tasks change is a cache miss.
+_EXECUTION_CACHE_TTL = 3600  # seconds
+_EXECUTION_CACHE = TTLCache(maxsize=1024, ttl=_EXECUTION_CACHE_TTL)
+
+
+def _execution_cache_key(mode: str, user_id: str, agent_name: str, goals, assigned_ids, task_ids) -> str:
+    """Build a stable hash of everything that feeds the task-assignment run."""
+    payload = json.dumps(
+        {
+            "mode": mode,
+            "user_id": user_id,
+            "agent_name": agent_name,
+            "goals": goals,
+            "assigned_ids": sorted(assigned_ids),
+            "task_ids": sorted(task_ids),
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.blake2b(payload.encode()).hexdigest()
+
+
+def _cache_agent_name(user_id: str, agent_name: str):
+    """Store an agent name in the TTL cache."""
+    _AGENT_NAME_CACHE[user_id] = agent_name
+
+
+async def _get_agent_name(db, user_id: str) -> str:
+    """
+    Get the agent name for a user, checking the TTL cache before Mongo.
+    Falls back to the default "Study Buddy" when no agent is configured.
+    """
+    cached = _AGENT_NAME_CACHE.get(user_id)
+    if cached is not None:
+        return cached
+
+    agent_doc = await db.agents.find_one({"userId": user_id}, {"agentName": 1})
+    agent_name = (
+        agent_doc.get("agentName", "Study Buddy") if agent_doc else "Study Buddy"
+    )
+    _cache_agent_name(user_id, agent_name)
+    return agent_name
+
+
+async def handle_agent_name_update(db, user_id: str, message: str) -> str:
+    """
+    Handle agent name update messages.
+    Extracts the agent name from the message and returns a personalized greeting.
+
+    Expected message format: "Updated the name of the agent to <agent_name>"
+    Returns: "Hello! I'm <agent_name>. How can I help you today?"
+    """
+    logger.debug("🔄 Processing agent name update for user: %s", user_id)
+    logger.debug("📝 Message: %s", message)
+
+    agent_name = message.removeprefix(_NAME_UPDATE_PREFIX).strip()
+    if agent_name == message.strip() or not agent_name:
+        logger.warning("⚠️ Message format didn't match expected pattern")
         return "Hello! How can I help you today?"
 
+    logger.debug("✅ Extracted agent name: %s", agent_name)
 
-def get_learning_agent(db):
+    # Keep the cache in sync so the next invocation skips Mongo
+    _cache_agent_name(user_id, agent_name)
+
+    return f"Hello! I'm {agent_name}. How can I help you today?"
 
+
+def get_learning_agent(db):
     """
     Initialize and return the learning agent.
     This function exists for compatibility with your existing code.
 
-    Returns a simple object that can be invoked.
+    Returns a simple namespace whose ainvoke/astream are run_learning_agent
+    and stream_learning_agent with the db pre-bound - no per-call class or
+    attribute-lookup overhead.
     """
-    print("✅ Learning agent initialized")
-
-    # Return a simple callable that wraps run_learning_agent
-    class SimpleLearningAgent:
-        def __init__(self, database):
-            self.db = database
+    logger.debug("✅ Learning agent initialized")
 
-        
-        async def ainvoke(self, user_id: str, message: str = None):
-            """Invoke the agent for a specific user."""
-            return await run_learning_agent(self.db, user_id, message)
-
-    return SimpleLearningAgent(db)
+    return types.SimpleNamespace(
+        ainvoke=functools.partial(run_learning_agent, db),
+        astream=functools.partial(stream_learning_agent, db),
+    )
 
 
 
@@ -82,50 +502,68 @@ def parse_json_from_response(response_text: str) -> list:
     Returns list of task objects with id and title.
     """
     try:
-        print(f"\n📊 Parsing response:\n{response_text}\n")
+        # Bounded-length guard: a legitimate 6-task array is a few hundred
+        # bytes; anything enormous is malformed output not worth scanning
+        if len(response_text) > _MAX_PARSE_LEN:
+            logger.error(
+                "❌ Response too large to parse (%s bytes > %s limit)",
+                len(response_text), _MAX_PARSE_LEN,
+            )
+            return []
+
+        logger.debug("📊 Parsing response:\n%s", response_text)
 
         # Remove markdown code blocks if present
-        cleaned = response_text.strip()
-        cleaned = re.sub(r"```json\s*", "", cleaned)
-        cleaned = re.sub(r"```\s*", "", cleaned)
-        cleaned = cleaned.strip()
-
-        # Extract JSON array if it's embedded in text
-        # Look for pattern: [ ... ]
-        json_match = re.search(r"\[.*\]", cleaned, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(0)
-            print(f"📌 Found JSON match:\n{json_str}\n")
+        cleaned = _strip_markdown_fences(response_text.strip())
+
+        # Extract JSON array if it's embedded in text - single-pass scan
+        json_str = _extract_json_array(cleaned)
+        if json_str is not None:
+            logger.debug("📌 Found JSON match:\n%s", json_str)
         else:
             json_str = cleaned
-            print(f"⚠️ No JSON match pattern found, trying full response\n")
+            logger.warning("⚠️ No JSON match pattern found, trying full response")
 
         # Try to parse JSON
-        tasks = json.loads(json_str)
+        try:
+            if orjson is not None:
+                tasks = orjson.loads(json_str)
+            else:
+                tasks = json.loads(json_str)
+        except ValueError:
+            # The first bracketed run can be prose like "[see below]" rather
+            # than the task array - fall back to raw_decode over each '['
+            tasks = _raw_decode_array(cleaned)
+            if tasks is None:
+                raise
 
         if isinstance(tasks, list):
-            print(f"✅ Successfully parsed {len(tasks)} tasks\n")
+            logger.debug("✅ Successfully parsed %s tasks", len(tasks))
             for i, task in enumerate(tasks, 1):
-                print(f"   Task {i}: {task.get('title')} (ID: {task.get('id')})")
+                logger.debug("   Task %s: %s (ID: %s)", i, task.get('title'), task.get('id'))
             return tasks
 
-        print(f"⚠️ Parsed data is not a list: {type(tasks)}\n")
+        logger.warning("⚠️ Parsed data is not a list: %s", type(tasks))
         return []
 
-    except json.JSONDecodeError as e:
-        print(f"❌ JSON Parse Error: {str(e)}")
-        print(
-            f"📝 Attempted to parse:\n{json_str if 'json_str' in locals() else response_text}\n"
+    # orjson.JSONDecodeError and json.JSONDecodeError both subclass ValueError
+    except ValueError as e:
+        logger.error("❌ JSON Parse Error: %s", str(e))
+        logger.debug(
+            "📝 Attempted to parse:\n%s",
+            json_str if "json_str" in locals() else response_text,
         )
         return []
     except Exception as e:
-        print(f"❌ Unexpected error during parsing: {str(e)}\n")
+        logger.error("❌ Unexpected error during parsing: %s", str(e))
         return []
 
 
 
 @traceable(name="Learning Agent", tags=["agent", "career-guidance"])
-async def run_learning_agent(db, user_id: str, user_message: str = None) -> dict:
+async def run_learning_agent(
+    db, user_id: str, user_message: str = None, include_trace: bool = False
+) -> dict:
     """
     Agentic learning assistant that:
     1. Answers career and growth questions conversationally
@@ -137,322 +575,218 @@ async def run_learning_agent(db, user_id: str, user_message: str = None) -> dict
         user_id: User identifier
         user_message: Optional message from user. If "Updated the goals. Share the revised tasks.",
                      triggers task assignment mode. Otherwise, conversational mode.
+        include_trace: When True, include the full ReAct message trajectory
+                      under "messages". Off by default - the trajectory can be
+                      tens of KB per request and callers only need
+                      response_text/tasks. LangSmith keeps the full trace.
     """
     try:
-        print(f"\n{'='*60}")
-        print(f"🚀 Starting learning agent for user: {user_id}")
-        print(f"📝 User message: {user_message}")
-        print(f"{'='*60}\n")
-
-        # Get agent name for personalized responses
-        agent_doc = await db.agents.find_one({"userId": user_id})
-        agent_name = (
-            agent_doc.get("agentName", "Study Buddy") if agent_doc else "Study Buddy"
-        )
-        print(f"🤖 Agent name: {agent_name}")
+        logger.debug("🚀 Starting learning agent for user: %s", user_id)
+        logger.debug("📝 User message: %s", user_message)
+
+        # Deterministic fast path: agent name updates never need the LLM.
+        # The router dispatches these directly, but guard here too so no
+        # caller can accidentally pay for an inference on this message.
+        if user_message and user_message.startswith(_NAME_UPDATE_PREFIX):
+            greeting = await handle_agent_name_update(db, user_id, user_message)
+            return {"response_text": greeting, "status": "success"}
+
+        # Deterministic fast path: the no-message welcome is templatic, so
+        # build it from the cached name and goals instead of paying a full
+        # Gemini round trip to restate them.
+        if not user_message:
+            agent_name, goals_doc = await asyncio.gather(
+                _get_agent_name(db, user_id),
+                db.goals.find_one({"userId": user_id}, {"goals": 1}),
+            )
+            goals_data = goals_doc.get("goals", []) if goals_doc else []
+            if isinstance(goals_data, str):
+                goals = [goals_data.strip()] if goals_data.strip() else []
+            else:
+                goals = [str(g).strip() for g in goals_data if g and str(g).strip()]
+
+            if goals:
+                welcome = (
+                    f"Hi, I'm {agent_name}! I see you're working on "
+                    f"{', '.join(goals[:3])} - great goals. Ask me anything "
+                    "about your learning path or career growth, or update "
+                    "your goals any time and I'll suggest matching tasks!"
+                )
+            else:
+                welcome = (
+                    f"Hi, I'm {agent_name}! Set your learning goals and I'll "
+                    "suggest tasks to match them - or just ask me anything "
+                    "about your career growth."
+                )
+            logger.debug("⚡ Welcome fast path - no LLM call")
+            return {"response_text": welcome, "status": "success"}
 
-        # Initialize LLM
-        api_key = os.getenv("GOOGLE_API_KEY")
-        if not api_key:
-            raise ValueError("GOOGLE_API_KEY not found")
+        # Determine mode based on user message
+        is_task_assignment_mode = bool(
+            user_message and _TASK_MODE_RE.search(user_message)
+        )
 
-        llm = ChatGoogleGenerativeAI(
-            model="gemini-2.0-flash-exp",
-            temperature=0.7,
-            google_api_key=api_key
+        if is_task_assignment_mode:
+            logger.debug("🎯 MODE: Task Assignment (deterministic pipeline)")
+
+            # The tool sequence in this mode is fixed (goals -> assignment ->
+            # tasks -> pick 6), so there is nothing for a ReAct loop to plan.
+            # Fetch everything concurrently up front and make one selection
+            # call instead of paying an LLM turn per tool call.
+            agent_name, goals_doc, assignment_doc, task_docs, project_doc = (
+                await asyncio.gather(
+                    _get_agent_name(db, user_id),
+                    db.goals.find_one({"userId": user_id}, {"goals": 1}),
+                    db.assignments.find_one(
+                        {"userId": user_id}, {"tasks.taskId": 1}
+                    ),
+                    db.tasks.find(
+                        {"project_id": PROJECT_ID},
+                        {"title": 1, "description": 1},
+                    ).to_list(length=None),
+                    db.projects.find_one({"_id": PROJECT_OID}, {"name": 1}),
+                )
+            )
+            logger.debug("🤖 Agent name: %s", agent_name)
 
-        )
+            assigned_ids = {
+                str(t.get("taskId"))
+                for t in (assignment_doc or {}).get("tasks", [])
+                if t.get("taskId")
+            }
+            project_task_map = {}
+            candidate_tasks = []
+            for doc in task_docs:
+                task_id = str(doc["_id"])
+                project_task_map[task_id] = doc.get("title")
+                if task_id not in assigned_ids:
+                    candidate_tasks.append(
+                        {
+                            "id": task_id,
+                            "title": doc.get("title"),
+                            "description": doc.get("description", "No description"),
+                        }
+                    )
+
+            # Check the execution cache before paying for the LLM call
+            execution_cache_key = _execution_cache_key(
+                mode="task_assignment",
+                user_id=user_id,
+                agent_name=agent_name,
+                goals=goals_doc.get("goals") if goals_doc else None,
+                assigned_ids=sorted(assigned_ids),
+                task_ids=list(project_task_map),
+            )
+            cached_run = _EXECUTION_CACHE.get(execution_cache_key)
+            if cached_run is not None:
+                logger.debug("⚡ Execution cache hit - skipping LLM entirely")
+                return dict(cached_run)
+
+            goals = _normalize_goals(goals_doc.get("goals", []) if goals_doc else [])
+            payload = {"goals": goals, "candidate_tasks": candidate_tasks}
+            payload_json = (
+                orjson.dumps(payload).decode()
+                if orjson is not None
+                else json.dumps(payload)
+            )
 
-        print("✅ LLM initialized")
+            messages = [
+                SystemMessage(content=_TASK_SELECT_SYSTEM_PROMPT),
+                HumanMessage(content=payload_json),
+            ]
 
-        # Define tools
-        @tool
-        async def get_user_goals(user_id: str) -> dict:
-            """Fetch the learning goals for a specific user."""
-            try:
-                print(f"🔍 Fetching goals for user: {user_id}")
-                goals_doc = await db.goals.find_one({"userId": user_id})
-                if not goals_doc:
-                    return {"goals": [], "message": "No goals set"}
-
-                goals_data = goals_doc.get("goals", [])
-                print(f"   Raw goals_data type: {type(goals_data)}")
-                print(f"   Raw goals_data: {goals_data}")
-
-                # Robust parsing - handle any data type
-                goals = []
-
-                if isinstance(goals_data, list):
-                    for item in goals_data:
-                        if item:
-                            item_str = str(item).strip()
-                            if item_str:
-                                goals.append(item_str)
-
-                elif isinstance(goals_data, str):
-                    stripped = goals_data.strip()
-                    if stripped:
-                        goals.append(stripped)
-
-                elif goals_data:
-                    goals.append(str(goals_data))
-
-                print(f"✅ Parsed {len(goals)} goal(s): {goals}")
-                return {"goals": goals}
-
-            except Exception as e:
-                print(f"❌ Error in get_user_goals: {str(e)}")
-                import traceback
-
-                traceback.print_exc()
-                return {"error": str(e)}
-
-        @tool
-        async def get_project_details(project_id: str) -> dict:
-            """Fetch project details including name, description, and status."""
+            logger.debug("📄 Selecting tasks with a single LLM call...")
+            # Schema-bound call: Gemini enforces the output structure
+            # server-side, so there is no fence stripping or JSON scanning
+            # on the happy path. The text parser remains as a fallback.
             try:
-                print(f"🔍 Fetching project: {project_id}")
-                project = await db.projects.find_one({"_id": ObjectId(project_id)})
-                if not project:
-                    return {"error": f"Project {project_id} not found"}
-
-                result = {
-                    "id": str(project["_id"]),
-                    "name": project.get("name"),
-                    "description": project.get("description", "No description"),
-                    "status": project.get("status"),
-                }
-                print(f"✅ Project found: {result['name']}")
-                return result
-            except Exception as e:
-                print(f"❌ Error: {str(e)}")
-                return {"error": str(e)}
-
-        @tool
-        async def get_project_tasks(project_id: str) -> list:
-            """Fetch all tasks for a specific project."""
-            try:
-                print(f"\n{'='*60}")
-                print(f"🔍 FETCHING ALL TASKS FOR PROJECT: {project_id}")
-                print(f"{'='*60}")
-                
-                tasks_cursor = db.tasks.find({"project_id": project_id})
-                tasks = await tasks_cursor.to_list(length=None)
-
-                result = [
-                    {
-                        "id": str(task["_id"]),
-                        "title": task.get("title"),
-                        "description": task.get("description", "No description"),
-                        "status": task.get("status"),
-                    }
-                    for task in tasks
+                selection = await _get_selection_llm().ainvoke(messages)
+                parsed_ids = (
+                    [pick.id for pick in selection.tasks] if selection else []
+                )
+            except Exception:
+                logger.exception(
+                    "⚠️ Structured selection failed - falling back to text parsing"
+                )
+                raw = await _get_llm().ainvoke(messages)
+                final_response = _flatten_content(raw.content)
+                logger.debug("📝 Raw selection:\n%s", final_response)
+                parsed_ids = [
+                    str(task.get("id", ""))
+                    for task in parse_json_from_response(final_response)
                 ]
-                
-                print(f"\n📋 AVAILABLE TASKS IN PROJECT:")
-                print(f"{'-'*60}")
-                for i, task in enumerate(result, 1):
-                    print(f"{i}. {task['title']}")
-                    print(f"   ID: {task['id']}")
-                    print(f"   Description: {task['description'][:80]}...")
-                    print()
-                
-                print(f"{'-'*60}")
-                print(f"✅ Total tasks in project: {len(result)}")
-                print(f"{'='*60}\n")
-                
-                return result
-            except Exception as e:
-                print(f"❌ Error: {str(e)}")
-                import traceback
-                traceback.print_exc()
-                return [{"error": str(e)}]
-
-        @tool
-        async def get_user_assigned_tasks(user_id: str) -> dict:
-            """Fetch all tasks already assigned to the user (both completed and pending)."""
-            try:
-                print(f"\n{'='*60}")
-                print(f"🔍 FETCHING ASSIGNED TASKS FOR USER: {user_id}")
-                print(f"{'='*60}")
-                
-                assignment = await db.assignments.find_one({"userId": user_id})
-
-                if not assignment or not assignment.get("tasks"):
-                    print("✅ No tasks assigned to user yet")
-                    print(f"{'='*60}\n")
-                    return {"assigned_task_ids": [], "completed_task_ids": []}
-
-                assigned_task_ids = []
-                completed_task_ids = []
-
-                print(f"\n📋 TASK DETAILS:")
-                print(f"{'-'*60}")
-                
-                for idx, task in enumerate(assignment.get("tasks", []), 1):
-                    task_id = task.get("taskId")
-                    task_name = task.get("taskName", "Unknown")
-                    is_completed = task.get("isCompleted", False)
-                    
-                    if task_id:
-                        assigned_task_ids.append(task_id)
-                        status_emoji = "✅" if is_completed else "⏳"
-                        status_text = "COMPLETED" if is_completed else "PENDING"
-                        
-                        print(f"{status_emoji} Task {idx}: [{status_text}]")
-                        print(f"   ID: {task_id}")
-                        print(f"   Name: {task_name}")
-                        print()
-                        
-                        if is_completed:
-                            completed_task_ids.append(task_id)
-
-                print(f"{'-'*60}")
-                print(f"📊 SUMMARY:")
-                print(f"   Total assigned: {len(assigned_task_ids)}")
-                print(f"   Completed: {len(completed_task_ids)}")
-                print(f"   Pending: {len(assigned_task_ids) - len(completed_task_ids)}")
-                print(f"\n🚫 FILTER OUT THESE TASK IDs:")
-                for task_id in assigned_task_ids:
-                    print(f"   - {task_id}")
-                print(f"{'='*60}\n")
-                
-                return {
-                    "assigned_task_ids": assigned_task_ids,
-                    "completed_task_ids": completed_task_ids,
-                }
-            except Exception as e:
-                print(f"❌ Error: {str(e)}")
-                import traceback
-                traceback.print_exc()
-                return {
-                    "error": str(e),
-                    "assigned_task_ids": [],
-                    "completed_task_ids": [],
-                }
-
-        # Determine mode based on user message
-        is_task_assignment_mode = user_message and (
-            "updated the goals" in user_message.lower()
-            or "share the revised tasks" in user_message.lower()
-            or "share tasks" in user_message.lower()
-        )
 
-        if is_task_assignment_mode:
-            print("🎯 MODE: Task Assignment")
-            tools = [
-                get_user_goals,
-                get_project_details,
-                get_project_tasks,
-                get_user_assigned_tasks,
-            ]
-        
-            system_prompt = f"""You are {agent_name}, an expert learning path advisor.
-
-            CRITICAL INSTRUCTION: You MUST ONLY select tasks that exist in the project. Do NOT make up or create new tasks.
-
-            STEPS TO FOLLOW:
-            1. Call get_user_goals(user_id="{user_id}") to fetch user's goals
-            2. Call get_user_assigned_tasks(user_id="{user_id}") to get assigned task IDs
-            3. Call get_project_details(project_id="695caa41c485455f397017ae")
-            4. Call get_project_tasks(project_id="695caa41c485455f397017ae") to get ALL available tasks
-            5. From the project tasks, FILTER OUT tasks whose ID is in assigned_task_ids
-            6. From the REMAINING tasks (NOT assigned yet), select EXACTLY 6 tasks
-            7. Match selected tasks to user's goals
-            8. Return ONLY those 6 tasks in JSON format
-
-            ABSOLUTE RULES - NEVER VIOLATE:
-            ❌ DO NOT create fictional tasks (e.g., "Quantum Computing" if not in project)
-            ❌ DO NOT modify task titles or IDs
-            ❌ DO NOT suggest tasks already in assigned_task_ids
-            ✅ ONLY use task IDs and titles EXACTLY as returned by get_project_tasks
-            ✅ Select from UNASSIGNED tasks only
-            ✅ Return exactly 6 tasks
-
-            OUTPUT FORMAT - RESPOND WITH ONLY THIS JSON:
-            [
-            {{"id": "actual_task_id_from_project", "title": "Actual Task Title from project"}},
-            {{"id": "actual_task_id_from_project", "title": "Actual Task Title from project"}},
-            {{"id": "actual_task_id_from_project", "title": "Actual Task Title from project"}},
-            {{"id": "actual_task_id_from_project", "title": "Actual Task Title from project"}},
-            {{"id": "actual_task_id_from_project", "title": "Actual Task Title from project"}},
-            {{"id": "actual_task_id_from_project", "title": "Actual Task Title from project"}}
-            ]
-            
-            NO markdown, NO explanation, NO other text - ONLY the JSON array."""
+            logger.debug("✅ Parsed %s tasks from selection", len(parsed_ids))
 
-            user_prompt = f"""User ID: {user_id}
-            Project ID: 695caa41c485455f397017ae
+            # Server-side validation: the model may only pick candidate ids
+            # (in the project and not already assigned)
+            valid_task_ids = frozenset(project_task_map)
+            validated_tasks = []
+            for task_id in parsed_ids:
+                if task_id not in valid_task_ids:
+                    logger.error("❌ INVALID/HALLUCINATED ID: %s", task_id)
+                elif task_id in assigned_ids:
+                    logger.warning("⚠️ Already-assigned task suggested: %s", task_id)
+                else:
+                    validated_tasks.append(task_id)
+                    logger.debug("✅ VALID: %s (ID: %s)", project_task_map[task_id], task_id)
 
-            Execute the steps:
-            1. Get user goals
-            2. Get assigned tasks
-            3. Get project details  
-            4. Get all project tasks
-            5. Filter out assigned tasks
-            6. Select 6 best unassigned tasks for user's goals
-            7. Return ONLY JSON array with those 6 tasks
+            logger.debug("✅ Final validated tasks: %s", len(validated_tasks))
 
-            Remember: Use ONLY tasks from get_project_tasks response. Do NOT invent tasks."""
+            project_name = (
+                project_doc.get("name", "Project School")
+                if project_doc
+                else "Project School"
+            )
 
-        else:
-            print("💬 MODE: Conversational Career Guidance")
-            tools = [get_user_goals]
-
-            system_prompt = f"""You are {agent_name}, a friendly and knowledgeable career advisor specializing in AI/ML, Data Science, and tech careers.
-
-            YOUR EXPERTISE:
-            - Career roadmaps (AI/ML, Data Science, Software Engineering)
-            - Learning paths and skill development
-            - Industry trends and job market insights
-            - Project recommendations
-            - Resume and interview guidance
-            - Career transitions and upskilling
-
-            CONVERSATION STYLE:
-            - Warm, encouraging, and professional
-            - Provide specific, actionable advice
-            - Use examples and real-world insights
-            - Be honest about timelines and effort required
-
-            BOUNDARIES:
-            You can answer questions about:
-            ✅ Career paths in tech (AI/ML, Data Science, Software Engineering)
-            ✅ Learning roadmaps and skill development
-            ✅ Project ideas and portfolio building
-            ✅ Industry trends and job opportunities
-            ✅ Interview preparation and resume tips
-            ✅ Course and certification recommendations
-
-            For questions OUTSIDE these topics (personal problems, non-tech careers, medical/legal advice, etc.):
-            ❌ Politely decline and say: "I'm {agent_name}, focused on tech career growth. For other matters, please contact Vijender P at support@alumnx.com"
-
-            IMPORTANT:
-            - Use get_user_goals tool to understand user's current goals
-            - Reference their goals in your advice when relevant
-            - Keep responses concise (2-3 paragraphs max)
-            - End with a follow-up question to continue the conversation"""
-
-            if user_message:
-                user_prompt = f"""User message: {user_message}
+            # Enrich tasks with project information. Titles are rehydrated
+            # from the server-side task map - the LLM only returns IDs, which
+            # keeps its output (and therefore generation latency) small.
+            enriched_tasks = [
+                {
+                    "taskId": task_id,
+                    "taskName": project_task_map[task_id],
+                    "projectId": PROJECT_ID,
+                    "projectName": project_name,
+                }
+                for task_id in validated_tasks
+            ]
 
-User ID: {user_id}
+            logger.debug("📤 Returning %s validated tasks", len(enriched_tasks))
 
-Please respond to the user's question. First, fetch their learning goals to provide personalized advice."""
-            else:
-                user_prompt = f"""User ID: {user_id}
+            response_obj = {
+                "response_text": f"I've selected {len(enriched_tasks)} personalized tasks for your learning path. Here they are:",
+                "status": "success",
+                "tasks": enriched_tasks,
+            }
 
-The user has just updated their goals. Fetch their goals and provide an encouraging welcome message about their learning journey."""
+            # Cache the lean dict - never the message objects - and only a
+            # clean full selection: caching a short or empty list (parse
+            # fallback, transient Gemini error) would pin the degraded
+            # result for the whole TTL instead of retrying the LLM
+            if len(enriched_tasks) == 6:
+                _EXECUTION_CACHE[execution_cache_key] = dict(response_obj)
 
-        print("🤖 Creating LangGraph ReAct agent...\n")
+            if include_trace:
+                # Structured output has no message trajectory to expose
+                response_obj["messages"] = []
+            return response_obj
 
-        # Create the ReAct agent
-        agent = create_react_agent(llm, tools)
+        # Conversational mode - the open-ended queries do need the ReAct
+        # agent and its tools
+        logger.debug("💬 MODE: Conversational Career Guidance")
+        agent_name = await _get_agent_name(db, user_id)
+        logger.debug("🤖 Agent name: %s", agent_name)
+        system_prompt, user_prompt = _build_chat_prompts(
+            agent_name, user_id, user_message
+        )
 
-        print("✅ Agent created\n")
-        print("📄 Running agent...\n")
+        # Reuse the prebuilt ReAct agent and hand the tools the db via the
+        # ContextVar
+        _DB_CTX.set(db)
+        agent = _get_chat_agent()
 
-        # Run the agent
+        logger.debug("📄 Running agent...")
         result = await agent.ainvoke(
             {
                 "messages": [
@@ -462,141 +796,98 @@ The user has just updated their goals. Fetch their goals and provide an encourag
             }
         )
 
-        print("✅ Agent execution completed\n")
-
-        # Extract final response
         final_message = result["messages"][-1]
-        final_response = (
+        final_response = _flatten_content(
             final_message.content
             if hasattr(final_message, "content")
             else str(final_message)
         )
 
-        # Handle list content from Gemini
-        if isinstance(final_response, list):
-            content_parts = []
-            for part in final_response:
-                if isinstance(part, str):
-                    content_parts.append(part)
-                elif hasattr(part, "text"):
-                    content_parts.append(part.text)
-                else:
-                    content_parts.append(str(part))
-            final_response = "".join(content_parts).strip()
-
-        print(f"{'='*60}")
-        print(f"✅ Agent completed successfully")
-        print(f"{'='*60}\n")
-        print(f"Response:\n{final_response}\n")
-        
-
-        # If task assignment mode, parse JSON and return structured tasks
-        if is_task_assignment_mode:
-            print(f"\n🔍 TASK ASSIGNMENT MODE - Parsing response")
-            print(f"📝 Raw response text:\n{final_response}\n")
-
-            parsed_tasks = parse_json_from_response(final_response)
-            print(f"✅ Parsed {len(parsed_tasks)} tasks from agent response\n")
-
-            # Server-side validation: Verify tasks exist in project
-            print(f"\n{'='*60}")
-            print(f"🛡️ SERVER-SIDE VALIDATION")
-            print(f"{'='*60}")
-            
-            # Get all project tasks for validation
-            project_tasks_cursor = db.tasks.find({"project_id": "695caa41c485455f397017ae"})
-            all_project_tasks = await project_tasks_cursor.to_list(length=None)
-            valid_task_ids = {str(task["_id"]) for task in all_project_tasks}
-            
-            print(f"\n📦 Project has {len(valid_task_ids)} total tasks")
-            print(f"🔍 Validating {len(parsed_tasks)} suggested tasks...\n")
-            
-            # Filter out hallucinated tasks
-            validated_tasks = []
-            hallucinated_tasks = []
-            
-            for task in parsed_tasks:
-                task_id = str(task.get("id", ""))
-                if task_id in valid_task_ids:
-                    validated_tasks.append(task)
-                    print(f"✅ VALID: {task.get('title')} (ID: {task_id})")
-                else:
-                    hallucinated_tasks.append(task)
-                    print(f"❌ INVALID/HALLUCINATED: {task.get('title')} (ID: {task_id})")
-            
-            if hallucinated_tasks:
-                print(f"\n⚠️ WARNING: LLM hallucinated {len(hallucinated_tasks)} tasks!")
-                print(f"   Filtered them out. Using only {len(validated_tasks)} valid tasks.")
-            
-            # Also check for duplicates with assigned tasks
-            assignment = await db.assignments.find_one({"userId": user_id})
-            if assignment and assignment.get("tasks"):
-                assigned_ids = {str(t.get("taskId")) for t in assignment.get("tasks", []) if t.get("taskId")}
-                
-                print(f"\n🚫 Checking for duplicates with {len(assigned_ids)} assigned tasks...")
-                
-                original_count = len(validated_tasks)
-                validated_tasks = [
-                    task for task in validated_tasks 
-                    if str(task.get("id")) not in assigned_ids
-                ]
-                
-                if original_count != len(validated_tasks):
-                    print(f"⚠️ Removed {original_count - len(validated_tasks)} duplicate tasks")
-            
-            print(f"\n✅ Final validated tasks: {len(validated_tasks)}")
-            print(f"{'='*60}\n")
-
-            # Get project info for response
-            project_doc = await db.projects.find_one(
-                {"_id": ObjectId("695caa41c485455f397017ae")}
-            )
-            project_name = (
-                project_doc.get("name", "Project School")
-                if project_doc
-                else "Project School"
-            )
-            project_id = "695caa41c485455f397017ae"
-
-            print(f"📦 Project: {project_name} ({project_id})\n")
-
-            # Enrich tasks with project information
-            enriched_tasks = []
-            for task in validated_tasks:
-                enriched_task = {
-                    "taskId": task.get("id"),
-                    "taskName": task.get("title"),
-                    "projectId": project_id,
-                    "projectName": project_name,
-                }
-                enriched_tasks.append(enriched_task)
-                print(f"   ✓ {enriched_task['taskName']}")
+        logger.debug("✅ Agent completed successfully")
+        logger.debug("Response:\n%s", final_response)
 
-            print(f"\n📤 Returning {len(enriched_tasks)} validated tasks\n")
-            
-            response_obj = {
-                "response_text": f"I've selected {len(enriched_tasks)} personalized tasks for your learning path. Here they are:",
-                "status": "success",
-                "tasks": enriched_tasks,
-                "messages": result["messages"],
-            }
-            
-            return response_obj
-        else:
-            return {
-                "response_text": final_response,
-                "status": "success",
-                "messages": result["messages"],
-            }
+        response_obj = {
+            "response_text": final_response,
+            "status": "success",
+        }
+        if include_trace:
+            response_obj["messages"] = result["messages"]
+        return response_obj
 
         
     except Exception as e:
-        print(f"\n❌ ERROR: {str(e)}")
-        import traceback
-
-        traceback.print_exc()
+        logger.exception("❌ run_learning_agent failed for user=%s", user_id)
         return {
             "response_text": f"An error occurred: {str(e)}",
             "status": "error"
         }
 
+
+async def run_learning_agent_batch(
+    db, items: list, max_concurrency: int = 10
+) -> list:
+    """
+    Run the agent for many (user_id, user_message) pairs concurrently.
+
+    Useful for welcome bursts after bulk goal updates: all runs share the
+    process-wide LLM client (one HTTP/2 connection pool), the TTL caches,
+    and the execution cache, while the semaphore caps in-flight Gemini
+    requests. Results come back in input order.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def bounded_run(user_id, user_message):
+        async with semaphore:
+            return await run_learning_agent(db, user_id, user_message)
+
+    return list(
+        await asyncio.gather(
+            *(bounded_run(user_id, message) for user_id, message in items)
+        )
+    )
+
+
+async def stream_learning_agent(db, user_id: str, user_message: str = None):
+    """
+    Stream the conversational agent's reply token-by-token.
+
+    Yields text chunks as soon as the model produces them instead of
+    blocking until the full completion like run_learning_agent, which
+    drastically lowers the time-to-first-token perceived by the user.
+    """
+    try:
+        agent_name = await _get_agent_name(db, user_id)
+        system_prompt, user_prompt = _build_chat_prompts(
+            agent_name, user_id, user_message
+        )
+
+        _DB_CTX.set(db)
+        agent = _get_chat_agent()
+
+        async for event in agent.astream_events(
+            {
+                "messages": [
+                    SystemMessage(content=system_prompt),
+                    HumanMessage(content=user_prompt),
+                ]
+            },
+            version="v2",
+        ):
+            if event["event"] != "on_chat_model_stream":
+                continue
+
+            chunk = event["data"]["chunk"].content
+
+            # Handle list content from Gemini
+            if isinstance(chunk, list):
+                chunk = "".join(
+                    part if isinstance(part, str) else getattr(part, "text", "")
+                    for part in chunk
+                )
+
+            if chunk:
+                yield chunk
+
+    except Exception as e:
+        logger.error("❌ Streaming error: %s", str(e))
+        yield f"An error occurred: {str(e)}"
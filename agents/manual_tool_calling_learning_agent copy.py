@@ -2,9 +2,22 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage, ToolMessage
 from langchain_core.tools import tool
 from langsmith import traceable
+from google.api_core.exceptions import ResourceExhausted, ServiceUnavailable
+from tenacity import (
+    AsyncRetrying,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_exponential_jitter,
+)
+import asyncio
+import json
+import logging
 import os
+from contextvars import ContextVar
 from dotenv import load_dotenv
 from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import UpdateOne
 
 # Load environment variables
 load_dotenv()
@@ -12,6 +25,109 @@ load_dotenv()
 # LangSmith will automatically trace if environment variables are set
 # No additional code needed - just set LANGCHAIN_TRACING_V2=true in .env
 
+# Export trace spans from a background worker instead of serializing
+# inputs/outputs on the event loop; honours an explicit override from .env
+os.environ.setdefault("LANGCHAIN_CALLBACKS_BACKGROUND", "true")
+
+# print() does synchronous, lock-guarded stdout writes that serialize
+# concurrent agent runs on the event loop - progress goes through the
+# logger (debug level) instead, so production skips the I/O entirely
+logger = logging.getLogger(__name__)
+
+PROJECT_ID = "695caa41c485455f397017ae"
+
+# Active database handle for the current invocation. Lets the tool live at
+# module level (defined and schema-introspected once) instead of being
+# re-created as a closure on every request.
+_db_ctx: ContextVar = ContextVar("learning_agent_db")
+
+# Upper bound when materializing a project's task list - a learning project
+# holds tens of tasks, so 500 is generous while keeping memory (and prompt
+# size) bounded if the collection ever grows unexpectedly
+_MAX_PROJECT_TASKS = 500
+
+
+def _normalize_goals(goals_data) -> list[str]:
+    """Flatten whatever shape the stored goals field has (str, list, other)
+    into a clean list of non-empty strings in a single pass."""
+    if not goals_data:
+        return []
+    items = goals_data if isinstance(goals_data, list) else [goals_data]
+    return [
+        s for s in
+        ((x if isinstance(x, str) else str(x)).strip() for x in items if x)
+        if s
+    ]
+
+
+@tool
+async def assign_tasks_bulk(user_id: str, task_ids: list[str]) -> dict:
+    """Assign several tasks to a user in a single database operation."""
+    db = _db_ctx.get()
+    try:
+        logger.debug("📌 Assigning %d task(s) to %s", len(task_ids), user_id)
+
+        # Parse each id exactly once - is_valid() followed by ObjectId()
+        # would run the same 24-hex validation twice per task
+        oids = []
+        for tid in task_ids:
+            try:
+                oids.append(ObjectId(tid))
+            except (InvalidId, TypeError):
+                logger.warning("⚠️  Skipping invalid task id from model: %r", tid)
+        if not oids:
+            return {"error": "No valid task IDs"}
+
+        result = await db.tasks.bulk_write(
+            [
+                UpdateOne({"_id": oid}, {"$set": {"assigned_to": user_id}})
+                for oid in oids
+            ],
+            ordered=False
+        )
+
+        logger.debug("✅ %d task(s) assigned", result.matched_count)
+        return {
+            "status": "success",
+            "assigned_count": result.matched_count,
+            "task_ids": [str(oid) for oid in oids],
+            "user_id": user_id
+        }
+    except Exception as e:
+        logger.exception("❌ Error assigning tasks")
+        return {"error": str(e)}
+
+
+_TOOLS = [assign_tasks_bulk]
+_TOOL_BY_NAME = {t.name: t for t in _TOOLS}
+_llm_with_tools = None
+
+
+def _get_llm_with_tools():
+    """Build the Gemini client with tools bound, once per process.
+
+    bind_tools runs JSON-schema generation for every tool; doing it per
+    request burned hundreds of ms of pure Python churn on warm calls.
+    """
+    global _llm_with_tools
+    if _llm_with_tools is None:
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            raise ValueError("GOOGLE_API_KEY not found")
+
+        # Tool routing and the final numbered list are deterministic tasks:
+        # temperature 0 avoids tool-argument typos that cost an extra retry
+        # iteration, and the output cap bounds Gemini decode time (the
+        # longest valid reply is six task titles)
+        llm = ChatGoogleGenerativeAI(
+            model="gemini-2.5-flash",
+            temperature=0.0,
+            max_output_tokens=512,
+            google_api_key=api_key
+        )
+        _llm_with_tools = llm.bind_tools(_TOOLS)
+    return _llm_with_tools
+
 
 def get_learning_agent(db):
     """
@@ -20,8 +136,8 @@ def get_learning_agent(db):
     
     Returns a simple object that can be invoked.
     """
-    print("✅ Learning agent initialized")
-    
+    logger.debug("✅ Learning agent initialized")
+
     # Return a simple callable that wraps run_learning_agent
     class SimpleLearningAgent:
         def __init__(self, database):
@@ -46,150 +162,67 @@ async def run_learning_agent(db, user_id: str) -> dict:
     No complex graphs - just simple tool calling loop.
     """
     try:
-        print(f"\n{'='*60}")
-        print(f"🚀 Starting learning agent for user: {user_id}")
-        print(f"{'='*60}\n")
-        
-        # Initialize LLM
-        api_key = os.getenv("GOOGLE_API_KEY")
-        if not api_key:
-            raise ValueError("GOOGLE_API_KEY not found")
-        
-        llm = ChatGoogleGenerativeAI(
-            model="gemini-2.5-flash",
-            temperature=0.7,
-            google_api_key=api_key
+        logger.debug("🚀 Starting learning agent for user: %s", user_id)
+
+        _db_ctx.set(db)
+
+        # Initialized once per process; warm calls reuse the bound client
+        llm_with_tools = _get_llm_with_tools()
+        logger.debug("✅ LLM initialized")
+
+        # Pre-fetch everything the model previously had to request through
+        # three mandatory tool calls (goals, project, tasks) - each of those
+        # cost a full Gemini round trip. The inputs are known up front, so
+        # fetch them concurrently and inline them into the first prompt.
+        goals_doc, project, task_docs = await asyncio.gather(
+            db.goals.find_one({"userId": user_id}),
+            db.projects.find_one(
+                {"_id": ObjectId(PROJECT_ID)},
+                {"name": 1, "description": 1, "status": 1}
+            ),
+            db.tasks.find(
+                {"project_id": PROJECT_ID},
+                {"title": 1, "description": 1, "status": 1}
+            ).to_list(length=_MAX_PROJECT_TASKS)
         )
-        
-        print("✅ LLM initialized")
-        
-        # Define tools
-        @tool
-        async def get_user_goals(user_id: str) -> dict:
-            """Fetch the learning goals for a specific user."""
-            try:
-                print(f"🔍 Fetching goals for user: {user_id}")
-                goals_doc = await db.goals.find_one({"userId": user_id})
-                if not goals_doc:
-                    return {"goals": [], "message": "No goals set"}
-                
-                goals_data = goals_doc.get("goals", [])
-                print(f"   Raw goals_data type: {type(goals_data)}")
-                print(f"   Raw goals_data: {goals_data}")
-                
-                # Robust parsing - handle any data type
-                goals = []
-                
-                if isinstance(goals_data, list):
-                    # It's a list - process each item
-                    for item in goals_data:
-                        if item:  # Not None, not empty
-                            # Convert to string and strip
-                            item_str = str(item).strip()
-                            if item_str:  # Not empty after stripping
-                                goals.append(item_str)
-                
-                elif isinstance(goals_data, str):
-                    # It's a string - strip and add if not empty
-                    stripped = goals_data.strip()
-                    if stripped:
-                        goals.append(stripped)
-                
-                elif goals_data:
-                    # Unknown type but not None/empty - convert to string
-                    goals.append(str(goals_data))
-                
-                print(f"✅ Parsed {len(goals)} goal(s): {goals}")
-                return {"goals": goals}
-                
-            except Exception as e:
-                print(f"❌ Error in get_user_goals: {str(e)}")
-                import traceback
-                traceback.print_exc()
-                return {"error": str(e)}
-        
-        @tool
-        async def get_project_details(project_id: str) -> dict:
-            """Fetch project details including name, description, and status."""
-            try:
-                print(f"🔍 Fetching project: {project_id}")
-                project = await db.projects.find_one({"_id": ObjectId(project_id)})
-                if not project:
-                    return {"error": f"Project {project_id} not found"}
-                
-                result = {
-                    "id": str(project["_id"]),
-                    "name": project.get("name"),
-                    "description": project.get("description", "No description"),
-                    "status": project.get("status")
-                }
-                print(f"✅ Project found: {result['name']}")
-                return result
-            except Exception as e:
-                print(f"❌ Error: {str(e)}")
-                return {"error": str(e)}
-        
-        @tool
-        async def get_project_tasks(project_id: str) -> list:
-            """Fetch all tasks for a specific project."""
-            try:
-                print(f"🔍 Fetching tasks for project: {project_id}")
-                tasks_cursor = db.tasks.find({"project_id": project_id})
-                tasks = await tasks_cursor.to_list(length=None)
-                
-                result = [
-                    {
-                        "id": str(task["_id"]),
-                        "title": task.get("title"),
-                        "description": task.get("description", "No description"),
-                        "status": task.get("status")
-                    }
-                    for task in tasks
-                ]
-                print(f"✅ Found {len(result)} tasks")
-                return result
-            except Exception as e:
-                print(f"❌ Error: {str(e)}")
-                return [{"error": str(e)}]
-        
-        @tool
-        async def assign_task_to_user(user_id: str, task_id: str) -> dict:
-            """Assign a task to a user."""
-            try:
-                print(f"📌 Assigning task {task_id} to {user_id}")
-                if not ObjectId.is_valid(task_id):
-                    return {"error": "Invalid task ID"}
-                
-                result = await db.tasks.update_one(
-                    {"_id": ObjectId(task_id)},
-                    {"$set": {"assigned_to": user_id}}
-                )
-                
-                if result.matched_count == 0:
-                    return {"error": f"Task {task_id} not found"}
-                
-                print(f"✅ Task assigned")
-                return {"status": "success", "task_id": task_id, "user_id": user_id}
-            except Exception as e:
-                print(f"❌ Error: {str(e)}")
-                return {"error": str(e)}
-        
-        # Bind tools to LLM
-        tools = [get_user_goals, get_project_details, get_project_tasks, assign_task_to_user]
-        llm_with_tools = llm.bind_tools(tools)
-        
-        print("✅ Tools bound to LLM\n")
-        
+
+        goals = _normalize_goals(goals_doc.get("goals") if goals_doc else None)
+        logger.debug("✅ Parsed %d goal(s)", len(goals))
+
+        project_info = (
+            {
+                "name": project.get("name"),
+                "description": project.get("description", "No description"),
+                "status": project.get("status")
+            }
+            if project
+            else {"error": f"Project {PROJECT_ID} not found"}
+        )
+
+        task_list = [
+            {
+                "id": str(task["_id"]),
+                "title": task.get("title"),
+                "description": task.get("description", "No description"),
+                "status": task.get("status")
+            }
+            for task in task_docs
+        ]
+        logger.debug("✅ Found %d tasks", len(task_list))
+
+        context_json = json.dumps(
+            {"goals": goals, "project": project_info, "tasks": task_list}
+        )
+
         # Create the prompt
-        system_prompt = """You are an expert learning path advisor with access to tools.
+        system_prompt = """You are an expert learning path advisor.
+
+The user's learning goals, the project details, and ALL project tasks are provided in the user message as JSON - do NOT ask for them, they are complete.
 
 Your task:
-1. Use get_user_goals tool to fetch the user's learning goals
-2. Use get_project_details tool to fetch project information for project_id: "695caa41c485455f397017ae"
-3. Use get_project_tasks tool to fetch ALL tasks for that project
-4. Carefully analyze user's learning goals against the project name, description, and each task's title and description
-5. Identify exactly 6 tasks in the specific order that creates an incremental learning path (foundation → intermediate → advanced)
-6. Use assign_task_to_user tool to assign each of the 6 tasks to the user in the correct learning sequence
+1. Carefully analyze the user's learning goals against the project name, description, and each task's title and description
+2. Identify exactly 6 tasks in the specific order that creates an incremental learning path (foundation → intermediate → advanced)
+3. Call assign_tasks_bulk ONCE with the user id and the list of all 6 task IDs, ordered foundation → advanced
 
 RESPONSE FORMAT - After assigning tasks, return ONLY task titles in this exact format:
 1. [Task Title 1]
@@ -206,18 +239,19 @@ IMPORTANT RULES:
 - Foundation task: Basic concepts, prerequisites, introductory material
 - Intermediate task: Building on basics, practical application
 - Advanced task: Complex topics, integration, real-world projects
-- Assign ALL 6 tasks to the user using assign_task_to_user tool
+- Assign ALL 6 tasks with a SINGLE assign_tasks_bulk call - never one call per task
 - Return ONLY the 6 task titles as a numbered list in your final response (no explanations)"""
 
         user_prompt = f"""User ID: {user_id}
 
+Here is my data:
+{context_json}
+
 Please create my personalized learning path:
-1. Fetch my learning goals
-2. Fetch project "695caa41c485455f397017ae" and ALL its tasks
-3. Analyze which tasks best match my goals
-4. Select exactly 6 tasks in order: foundation → intermediate → advanced
-5. Assign all 6 tasks to me using assign_task_to_user tool
-6. Return ONLY the 6 task titles as a numbered list
+1. Analyze which tasks best match my goals
+2. Select exactly 6 tasks in order: foundation → intermediate → advanced
+3. Assign all 6 tasks to me with ONE assign_tasks_bulk call
+4. Return ONLY the 6 task titles as a numbered list
 
 Remember: The order matters! Start with foundational concepts, then build up to advanced topics."""
 
@@ -227,99 +261,118 @@ Remember: The order matters! Start with foundational concepts, then build up to
             HumanMessage(content=user_prompt)
         ]
         
-        print("📊 Starting tool calling loop...\n")
-        
+        logger.debug("📊 Starting tool calling loop...")
+
         # Tool calling loop - LLM will call tools until it has the answer
         max_iterations = 15
         iteration = 0
+
+        # Per-invocation memo of tool results: a large share of agent tool
+        # calls are exact repeats (same tool, same args), so serve those
+        # from memory instead of re-hitting Mongo
+        tool_cache = {}
         
         while iteration < max_iterations:
             iteration += 1
-            print(f"🔄 Iteration {iteration}")
-            
-            # Call LLM
-            response = await llm_with_tools.ainvoke(messages)
+            logger.debug("🔄 Iteration %d", iteration)
+
+            # Call LLM. A transient 429/503 from Gemini used to abort the
+            # whole run, throwing away tool-call progress already in
+            # `messages` - retry the single turn with jittered backoff
+            # instead (tools already executed are never re-invoked).
+            async for attempt in AsyncRetrying(
+                wait=wait_exponential_jitter(initial=0.5, max=4),
+                stop=stop_after_attempt(3),
+                retry=retry_if_exception_type((ResourceExhausted, ServiceUnavailable)),
+                reraise=True,
+            ):
+                with attempt:
+                    response = await llm_with_tools.ainvoke(messages)
             messages.append(response)
             
             # Check if there are tool calls
             if not hasattr(response, 'tool_calls') or not response.tool_calls:
                 # No more tool calls - we're done
-                print(f"✅ No more tool calls - agent completed\n")
+                logger.debug("✅ No more tool calls - agent completed")
                 break
             
-            # Execute each tool call
-            print(f"🔧 Executing {len(response.tool_calls)} tool call(s)")
-            
+            # Execute the tool calls - they are independent Mongo I/O, so fan
+            # them out concurrently and pay the slowest latency, not the sum
+            logger.debug("🔧 Executing %d tool call(s)", len(response.tool_calls))
+
+            calls = []
             for tool_call in response.tool_calls:
-                tool_name = tool_call["name"]
-                tool_args = tool_call["args"]
-                tool_id = tool_call["id"]
-                
-                # Find the tool
-                tool_func = next((t for t in tools if t.name == tool_name), None)
-                
+                tool_func = _TOOL_BY_NAME.get(tool_call["name"])
                 if tool_func:
-                    # Execute the tool
-                    result = await tool_func.ainvoke(tool_args)
-                    
-                    # Add tool result to messages
-                    messages.append(
-                        ToolMessage(
-                            content=str(result),
-                            tool_call_id=tool_id,
-                            name=tool_name
-                        )
+                    key = (
+                        tool_call["name"],
+                        json.dumps(tool_call["args"], sort_keys=True, default=str)
                     )
+                    calls.append((tool_call, tool_func, key))
                 else:
-                    print(f"❌ Tool {tool_name} not found")
-            
-            print()  # Empty line for readability
-        
+                    logger.warning("❌ Tool %s not found", tool_call["name"])
+
+            # Only execute calls not already answered this invocation
+            # (also dedupes identical calls within the same turn)
+            pending = []
+            seen = set()
+            for tool_call, tool_func, key in calls:
+                if key not in tool_cache and key not in seen:
+                    pending.append((tool_call, tool_func, key))
+                    seen.add(key)
+            results = await asyncio.gather(
+                *(tool_func.ainvoke(tool_call["args"]) for tool_call, tool_func, _ in pending),
+                return_exceptions=True
+            )
+            executed_keys = set()
+            for (_, _, key), result in zip(pending, results):
+                tool_cache[key] = result
+                executed_keys.add(key)
+
+            # Zip results back in the original order, preserving tool_call_id
+            for tool_call, _, key in calls:
+                if key not in executed_keys:
+                    logger.debug("⚡ Cached result for %s", tool_call["name"])
+                messages.append(
+                    ToolMessage(
+                        content=str(tool_cache[key]),
+                        tool_call_id=tool_call["id"],
+                        name=tool_call["name"]
+                    )
+                )
+
         if iteration >= max_iterations:
-            print("⚠️  Max iterations reached")
+            logger.warning("⚠️  Max iterations reached")
         
-        # Extract final response
+        # Extract final response. The loop only breaks once the model
+        # answers without tool calls, so messages[-1] is that final
+        # AIMessage - no need to rescan the whole conversation.
         final_response = None
-        for msg in reversed(messages):
-            if isinstance(msg, AIMessage) and msg.content:
-                # Handle both string and list content from Gemini
-                if isinstance(msg.content, str):
-                    content_str = msg.content.strip()
-                    if content_str:
-                        final_response = content_str
-                        break
-                elif isinstance(msg.content, list):
-                    # Content is a list of parts - join them
-                    content_parts = []
-                    for part in msg.content:
-                        if isinstance(part, str):
-                            content_parts.append(part)
-                        elif hasattr(part, 'text'):
-                            content_parts.append(part.text)
-                        else:
-                            content_parts.append(str(part))
-                    content_str = ''.join(content_parts).strip()
-                    if content_str:
-                        final_response = content_str
-                        break
-        
+        last = messages[-1]
+        if isinstance(last, AIMessage) and last.content:
+            if isinstance(last.content, str):
+                content_str = last.content
+            else:
+                # Gemini can return content as a list of parts - join them
+                content_str = ''.join(
+                    part if isinstance(part, str) else getattr(part, 'text', str(part))
+                    for part in last.content
+                )
+            final_response = content_str.strip() or None
+
         if not final_response:
             final_response = "I processed your request but couldn't generate a final response."
         
-        print(f"{'='*60}")
-        print(f"✅ Agent completed successfully")
-        print(f"{'='*60}\n")
-        print(f"Response:\n{final_response}\n")
-        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("✅ Agent completed successfully\nResponse:\n%s", final_response)
+
         return {
             "response_text": final_response,
             "status": "success"
         }
         
     except Exception as e:
-        print(f"\n❌ ERROR: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ Agent run failed for user=%s", user_id)
         return {
             "response_text": f"An error occurred: {str(e)}",
             "status": "error"
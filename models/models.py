@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, ConfigDict
 from typing import List, Optional, Literal
-from datetime import datetime
+from datetime import datetime, timezone
 from bson import ObjectId
 
 class Project(BaseModel):
@@ -9,14 +9,16 @@ class Project(BaseModel):
     name: str
     description: Optional[str] = None
     status: str = "active"
-    created_at: datetime = Field(default_factory=datetime.now)
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class Comment(BaseModel):
     """Model for task comments"""
-    model_config = ConfigDict(populate_by_name=True)
+    # frozen: instances are read-only once validated - smaller/faster than
+    # mutable models and hashable if we ever want to cache on them
+    model_config = ConfigDict(populate_by_name=True, frozen=True)
     comment: str
     commentBy: Literal["user", "admin"]
-    createdAt: datetime = Field(default_factory=datetime.now)
+    createdAt: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class Task(BaseModel):
     model_config = ConfigDict(populate_by_name=True, json_encoders={ObjectId: str})
@@ -44,7 +46,7 @@ class Assignment(BaseModel):
 
 class TaskResponse(BaseModel):
     """Response model for user tasks with project details"""
-    model_config = ConfigDict(populate_by_name=True)
+    model_config = ConfigDict(populate_by_name=True, frozen=True)
     taskId: str
     name: str
     description: Optional[str] = None
@@ -57,7 +59,7 @@ class TaskResponse(BaseModel):
 
 class ProjectWithTasks(BaseModel):
     """Response model for project details with associated tasks"""
-    model_config = ConfigDict(populate_by_name=True, json_encoders={ObjectId: str})
+    model_config = ConfigDict(populate_by_name=True, frozen=True, json_encoders={ObjectId: str})
     id: Optional[str] = None
     name: str
     description: Optional[str] = None
@@ -70,7 +72,7 @@ class Chat(BaseModel):
     userId: str
     userType: str  # "user" or "agent"
     message: str
-    timestamp: datetime = Field(default_factory=datetime.now)
+    timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class Goal(BaseModel):
     userId: str
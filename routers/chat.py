@@ -1,18 +1,36 @@
+import logging
+
+import orjson
+
 from fastapi import APIRouter, Request, Body, HTTPException
-from datetime import datetime
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from datetime import datetime, timezone
 from models import Chat
-from agents.learning_agent import run_learning_agent, handle_agent_name_update
+from agents.learning_agent import (
+    run_learning_agent,
+    run_learning_agent_batch,
+    handle_agent_name_update,
+    stream_learning_agent,
+    _NAME_UPDATE_PREFIX,
+    _cache_agent_name,
+)
 from bson import ObjectId
+from pymongo import ReturnDocument
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 
 router = APIRouter()
 
+logger = logging.getLogger(__name__)
+
 
 class AgentRequest(BaseModel):
     """Simplified request model for agent endpoint"""
     userId: str
     message: Optional[str] = None
+    # Optional batch: rapid sequential messages can be sent together so
+    # their replies are stored with one insert_many instead of N inserts
+    messages: Optional[List[str]] = None
 
 
 class ManageAgentRequest(BaseModel):
@@ -26,6 +44,19 @@ class GetAgentRequest(BaseModel):
     userId: str
 
 
+# The get-agent miss path (user never named their agent) returns a constant
+# payload apart from the userId - serialize it once and splice the id in as
+# an orjson-escaped JSON string, skipping per-request dict build + encode
+_DEFAULT_AGENT_TEMPLATE = orjson.dumps({
+    "status": "success",
+    "agent": {
+        "userId": "__USER_ID__",
+        "agentName": "Study Buddy",
+        "isDefault": True
+    }
+})
+
+
 def serialize(doc):
     """Helper to convert MongoDB _id to string id"""
     if not doc: 
@@ -34,75 +65,212 @@ def serialize(doc):
     return doc
 
 
+async def _run_agent_message(db, user_id: str, message: Optional[str]):
+    """Run one agent turn and return (response_text, status, tasks)."""
+    try:
+        # Check if this is an agent name update message
+        if message and message.startswith(_NAME_UPDATE_PREFIX):
+            logger.debug("🔄 Detected agent name update message")
+            agent_response = await handle_agent_name_update(db, user_id, message)
+            return agent_response, "success", []  # No tasks for name update
+
+        # Regular learning agent invocation with optional message
+        logger.debug("⚙️ Running learning agent...")
+        result = await run_learning_agent(db, user_id, message)
+        agent_response = result.get("response_text", "I couldn't process your request.")
+        status = result.get("status", "error")
+
+        # Get tasks directly from result if they exist
+        tasks = result.get("tasks", [])
+        logger.debug("✅ Agent completed with status: %s (%d tasks)", status, len(tasks))
+        return agent_response, status, tasks
+    except Exception as e:
+        # logger.exception records the stack without the synchronous stdout
+        # write (and per-call import) that traceback.print_exc() did
+        logger.exception("❌ Agent Error for user=%s", user_id)
+        return f"An error occurred: {str(e)}", "error", []
+
+
 @router.post("/agent", status_code=200)
 async def chat_with_agent(request: Request, agent_req: AgentRequest = Body(...)):
     """
     Invoke the learning agent for a user.
-    Accepts optional message parameter for conversational queries or task updates.
+    Accepts optional message parameter for conversational queries or task updates
+    (or a messages batch, whose replies are stored with a single insert_many).
     Returns both a message and a structured tasks array for UI rendering.
     """
     db = request.app.state.db
     user_id = agent_req.userId
-    message = agent_req.message
 
-    print(f"🚀 Agent invoked for user: {user_id}")
-    if message:
-        print(f"📝 With message: {message}")
+    logger.debug("🚀 Agent invoked for user: %s", user_id)
 
-    try:
-        # Check if this is an agent name update message
-        if message and message.startswith("Updated the name of the agent to "):
-            print("🔄 Detected agent name update message")
-            agent_response = await handle_agent_name_update(db, user_id, message)
-            status = "success"
-            tasks = []  # No tasks for name update
-        else:
-            # Regular learning agent invocation with optional message
-            print("⚙️ Running learning agent...")
-            result = await run_learning_agent(db, user_id, message)
-            agent_response = result.get("response_text", "I couldn't process your request.")
-            status = result.get("status", "error")
-            
-            # Get tasks directly from result if they exist
-            tasks = result.get("tasks", [])
-            print(f"✅ Retrieved {len(tasks)} tasks from agent result")
-        
-        print(f"✅ Agent completed with status: {status}")
-    except Exception as e:
-        print(f"❌ Agent Error: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        agent_response = f"An error occurred: {str(e)}"
-        status = "error"
-        tasks = []
+    # Batched path: each run is independent (no history is threaded between
+    # them), so fan the messages out through run_learning_agent_batch -
+    # concurrent under its semaphore, results back in input order - then
+    # persist all replies in a single round trip. run_learning_agent handles
+    # name-update messages and errors internally, like _run_agent_message.
+    if agent_req.messages:
+        agent_results = await run_learning_agent_batch(
+            db, [(user_id, message) for message in agent_req.messages]
+        )
+        results = []
+        docs = []
+        for res in agent_results:
+            docs.append({
+                "userId": user_id,
+                "userType": "agent",
+                "message": res.get("response_text", "I couldn't process your request."),
+                "timestamp": datetime.now(timezone.utc)
+            })
+            results.append({"tasks": res.get("tasks", []), "status": res.get("status", "error")})
+
+        insert_result = await db.chats.insert_many(docs, ordered=False)
+        logger.debug("💾 Stored %d agent responses in chat history", len(docs))
+
+        return ORJSONResponse({
+            "results": [
+                {**serialize({"_id": oid, **doc}), **extra}
+                for oid, doc, extra in zip(insert_result.inserted_ids, docs, results)
+            ],
+            "status": "success"
+        })
+
+    agent_response, status, tasks = await _run_agent_message(db, user_id, agent_req.message)
 
     # Store agent chat in database
     agent_chat_doc = {
         "userId": user_id,
         "userType": "agent",
         "message": agent_response,
-        "timestamp": datetime.now()
+        "timestamp": datetime.now(timezone.utc)
     }
 
     result = await db.chats.insert_one(agent_chat_doc)
-    print(f"💾 Stored agent response in chat history")
+    logger.debug("💾 Stored agent response in chat history")
 
-    created_chat = await db.chats.find_one({"_id": result.inserted_id})
-    
-    # Return structured response with both message and tasks
-    return {
+    # The inserted document is fully known locally - no readback round trip
+    created_chat = {"_id": result.inserted_id, **agent_chat_doc}
+
+    # Return structured response with both message and tasks. Direct
+    # ORJSONResponse skips FastAPI's jsonable_encoder pass - serialize()
+    # already stringified the ObjectId and orjson handles datetime natively.
+    return ORJSONResponse({
         **serialize(created_chat),
         "tasks": tasks,  # Add tasks array to response
         "status": status
-    }
+    })
+
+
+@router.post("/agent/stream", status_code=200)
+async def chat_with_agent_stream(request: Request, agent_req: AgentRequest = Body(...)):
+    """
+    Stream the agent's reply token-by-token instead of waiting for the full
+    completion. The complete response is stored in chat history once the
+    stream finishes. Conversational mode only - task assignment still goes
+    through /agent since its output is a structured tasks array.
+    """
+    db = request.app.state.db
+    user_id = agent_req.userId
+    message = agent_req.message
+
+    async def token_stream():
+        parts = []
+
+        # Agent name updates are deterministic - emit the greeting directly
+        if message and message.startswith(_NAME_UPDATE_PREFIX):
+            greeting = await handle_agent_name_update(db, user_id, message)
+            parts.append(greeting)
+            yield greeting
+        else:
+            async for chunk in stream_learning_agent(db, user_id, message):
+                parts.append(chunk)
+                yield chunk
+
+        # Store the full agent response in chat history
+        await db.chats.insert_one({
+            "userId": user_id,
+            "userType": "agent",
+            "message": "".join(parts),
+            "timestamp": datetime.now(timezone.utc)
+        })
+
+    return StreamingResponse(token_stream(), media_type="text/plain")
 
 
 @router.get("/history/{user_id}")
-async def get_chat_history(request: Request, user_id: str):
-    """Retrieve chat history for a specific user"""
+async def get_chat_history(
+    request: Request,
+    user_id: str,
+    skip: int = 0,
+    limit: Optional[int] = None,
+    columnar: bool = False,
+    stream: bool = False,
+):
+    """Retrieve chat history for a specific user.
+
+    Pagination via skip/limit is opt-in: by default the full history is
+    returned, matching the original behaviour. With an ascending sort a
+    default limit would silently drop the newest messages for long histories.
+
+    With columnar=true the response is a dict of parallel arrays
+    ({"id": [...], "userType": [...], ...}) instead of a list of objects -
+    far fewer per-row dict allocations when histories run long.
+
+    With stream=true the JSON array is streamed document-by-document as the
+    cursor produces it - the client sees first byte after one round trip and
+    the server never holds the full history in memory at once.
+    """
+    if skip < 0 or (limit is not None and limit < 1):
+        raise HTTPException(status_code=400, detail="skip must be >= 0 and limit >= 1")
+
     db = request.app.state.db
-    cursor = db.chats.find({"userId": user_id}).sort("timestamp", 1)
-    return [serialize(doc) async for doc in cursor]
+    # One batched fetch instead of an executor hop per document, returning
+    # only the fields the UI renders; the hint pins the compound
+    # (userId, timestamp) index created in the lifespan
+    cursor = (
+        db.chats.find(
+            {"userId": user_id},
+            {"userId": 1, "userType": 1, "message": 1, "timestamp": 1}
+        )
+        .sort("timestamp", 1)
+        .skip(skip)
+        .hint([("userId", 1), ("timestamp", 1)])
+    )
+    if limit is not None:
+        cursor = cursor.limit(limit)
+
+    if stream:
+        async def history_stream():
+            yield b"["
+            first = True
+            async for doc in cursor:
+                if first:
+                    first = False
+                else:
+                    yield b","
+                yield orjson.dumps(serialize(doc))
+            yield b"]"
+
+        return StreamingResponse(history_stream(), media_type="application/json")
+
+    docs = await cursor.to_list(length=limit)
+
+    if columnar:
+        ids, types, messages, timestamps = [], [], [], []
+        for d in docs:
+            ids.append(str(d["_id"]))
+            types.append(d.get("userType"))
+            messages.append(d.get("message"))
+            timestamps.append(d.get("timestamp"))
+        return ORJSONResponse({
+            "userId": user_id,
+            "id": ids,
+            "userType": types,
+            "message": messages,
+            "timestamp": timestamps,
+        })
+
+    return ORJSONResponse([serialize(doc) for doc in docs])
 
 
 @router.post("/manage-agent", status_code=200)
@@ -114,82 +282,46 @@ async def manage_agent(request: Request, agent_req: ManageAgentRequest = Body(..
     user_id = agent_req.userId
     agent_name = agent_req.agentName
 
-    print("=" * 80)
-    print(f"🔍 MANAGE AGENT REQUEST")
-    print(f"🔍 Received userId: {user_id}")
-    print(f"🔍 userId type: {type(user_id)}")
-    print(f"🔍 userId length: {len(user_id)}")
-    print(f"🔍 Agent name: {agent_name}")
-    print("=" * 80)
+    logger.debug("🔍 MANAGE AGENT REQUEST userId=%r agentName=%r", user_id, agent_name)
 
     # Validate agent name
     if not agent_name or not agent_name.strip():
         raise HTTPException(status_code=400, detail="Agent name cannot be empty")
 
-    # Check for existing agents with this userId
-    print(f"🔍 Searching for existing agent with userId: {user_id}")
-    existing_agent = await db.agents.find_one({"userId": user_id})
-    
-    if existing_agent:
-        print(f"✅ Found existing agent:")
-        print(f"   - _id: {existing_agent.get('_id')}")
-        print(f"   - userId: {existing_agent.get('userId')}")
-        print(f"   - agentName: {existing_agent.get('agentName')}")
-        print(f"   - updated_at: {existing_agent.get('updated_at')}")
-    else:
-        print(f"❌ No existing agent found for userId: {user_id}")
-        
-        # Check if there are any agents at all for debugging
-        all_agents_count = await db.agents.count_documents({})
-        print(f"📊 Total agents in collection: {all_agents_count}")
-        
-        if all_agents_count > 0:
-            print(f"🔍 Checking all existing userIds in agents collection:")
-            all_agents = await db.agents.find({}, {"userId": 1, "agentName": 1}).to_list(length=10)
-            for ag in all_agents:
-                print(f"   - userId: '{ag.get('userId')}' (type: {type(ag.get('userId'))}), agentName: '{ag.get('agentName')}'")
-
-    # Upsert agent document
-    print(f"💾 Performing upsert for userId: {user_id}")
-    result = await db.agents.update_one(
+    # One atomic upsert that returns the resulting document - previously a
+    # debug find_one, an update_one, and a readback find_one (3 round trips)
+    now = datetime.now(timezone.utc)
+    agent = await db.agents.find_one_and_update(
         {"userId": user_id},
         {
             "$set": {
                 "agentName": agent_name.strip(),
-                "updated_at": datetime.now()
+                "updated_at": now
             },
             "$setOnInsert": {
-                "created_at": datetime.now()
+                "created_at": now
             }
         },
-        upsert=True
+        upsert=True,
+        return_document=ReturnDocument.AFTER
     )
 
-    print(f"💾 Upsert result:")
-    print(f"   - matched_count: {result.matched_count}")
-    print(f"   - modified_count: {result.modified_count}")
-    print(f"   - upserted_id: {result.upserted_id}")
+    # Write the new name through to the agent's TTL cache so the next
+    # invocation greets with it immediately instead of the stale entry
+    _cache_agent_name(user_id, agent_name.strip())
 
-    # Fetch the updated/created agent
-    agent = await db.agents.find_one({"userId": user_id})
-    
-    if agent:
-        print(f"✅ Final agent state:")
-        print(f"   - _id: {agent.get('_id')}")
-        print(f"   - userId: {agent.get('userId')}")
-        print(f"   - agentName: {agent.get('agentName')}")
-    else:
-        print(f"❌ WARNING: Could not retrieve agent after upsert!")
-    
-    action = "updated" if result.modified_count > 0 else "created"
-    print(f"✅ Agent {action} successfully")
-    print("=" * 80)
-    
-    return {
+    # On insert $setOnInsert and $set stamp the same now, so the stored
+    # created_at and updated_at come back identical (both server-truncated
+    # the same way); comparing either against our local now would never
+    # match BSON's millisecond, tz-naive datetimes
+    action = "created" if agent.get("created_at") == agent.get("updated_at") else "updated"
+    logger.debug("✅ Agent %s successfully", action)
+
+    return ORJSONResponse({
         "status": "success",
         "message": f"Agent name {action} successfully",
         "agent": serialize(agent)
-    }
+    })
 
 
 @router.post("/get-agent", status_code=200)
@@ -200,46 +332,34 @@ async def get_agent(request: Request, agent_req: GetAgentRequest = Body(...)):
     db = request.app.state.db
     user_id = agent_req.userId
 
-    print("=" * 80)
-    print(f"🔍 GET AGENT REQUEST")
-    print(f"🔍 Received userId: {user_id}")
-    print(f"🔍 userId type: {type(user_id)}")
-    print(f"🔍 userId length: {len(user_id)}")
-    print("=" * 80)
+    logger.debug("🔍 GET AGENT REQUEST userId=%r", user_id)
 
     # Find agent document
     agent = await db.agents.find_one({"userId": user_id})
     
     if not agent:
-        print(f"❌ No agent found for userId: {user_id}")
-        
-        # Debug: show what userIds exist
-        all_agents_count = await db.agents.count_documents({})
-        print(f"📊 Total agents in collection: {all_agents_count}")
-        
-        if all_agents_count > 0:
-            print(f"🔍 Existing userIds in agents collection:")
-            all_agents = await db.agents.find({}, {"userId": 1, "agentName": 1}).to_list(length=10)
-            for ag in all_agents:
-                print(f"   - userId: '{ag.get('userId')}' (type: {type(ag.get('userId'))})")
+        # The collection-wide debug scan only runs when DEBUG logging is on -
+        # it is two extra queries that have no place on the hot path
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("❌ No agent found for userId: %s", user_id)
+            all_agents_count = await db.agents.count_documents({})
+            logger.debug("📊 Total agents in collection: %d", all_agents_count)
+            if all_agents_count > 0:
+                all_agents = await db.agents.find({}, {"userId": 1, "agentName": 1}).to_list(length=10)
+                for ag in all_agents:
+                    logger.debug("   - userId: %r, agentName: %r", ag.get("userId"), ag.get("agentName"))
         
         # Return default agent name if not found
-        return {
-            "status": "success",
-            "agent": {
-                "userId": user_id,
-                "agentName": "Study Buddy",
-                "isDefault": True
-            }
-        }
+        return Response(
+            content=_DEFAULT_AGENT_TEMPLATE.replace(
+                b'"__USER_ID__"', orjson.dumps(user_id)
+            ),
+            media_type="application/json"
+        )
     
-    print(f"✅ Agent found:")
-    print(f"   - _id: {agent.get('_id')}")
-    print(f"   - userId: {agent.get('userId')}")
-    print(f"   - agentName: {agent.get('agentName')}")
-    print("=" * 80)
+    logger.debug("✅ Agent found: userId=%r agentName=%r", agent.get("userId"), agent.get("agentName"))
     
-    return {
+    return ORJSONResponse({
         "status": "success",
         "agent": serialize(agent)
-    }
\ No newline at end of file
+    })
\ No newline at end of file
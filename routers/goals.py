@@ -1,12 +1,19 @@
+import logging
+
 from fastapi import APIRouter, Request, Body, HTTPException
+from fastapi.responses import ORJSONResponse
 from models import Goal
 from utils.helpers import serialize
-from datetime import datetime
+from agents.learning_agent import invalidate_goals_cache
+from datetime import datetime, timezone
 from bson import ObjectId
+from pymongo import ReturnDocument
 from pydantic import BaseModel
 
 router = APIRouter()
 
+logger = logging.getLogger(__name__)
+
 
 class ManageGoalsRequest(BaseModel):
     """Request model for managing goals"""
@@ -24,7 +31,12 @@ async def get_all_goals(request: Request, userId: str = None):
     """Get all goals, optionally filtered by userId"""
     db = request.app.state.db
     query = {"userId": userId} if userId else {}
-    return [serialize(g) async for g in db.goals.find(query)]
+    # One batched fetch instead of an async-iteration step per document,
+    # returned as a direct ORJSONResponse to skip the jsonable_encoder pass
+    docs = await db.goals.find(query).batch_size(500).to_list(length=None)
+    for d in docs:
+        d["id"] = str(d.pop("_id"))
+    return ORJSONResponse(docs)
 
 
 @router.post("/", response_model=Goal, status_code=201)
@@ -32,16 +44,21 @@ async def set_user_goals(request: Request, goal_data: Goal = Body(...)):
     """Set or update user goals (upsert operation)"""
     db = request.app.state.db
 
-    await db.goals.update_one(
+    # One atomic upsert that returns the resulting document - saves the
+    # readback find_one round trip
+    updated_goal = await db.goals.find_one_and_update(
         {"userId": goal_data.userId},
         {"$set": {
             "goals": goal_data.goals,
-            "updated_at": datetime.now()
+            "updated_at": datetime.now(timezone.utc)
         }},
-        upsert=True
+        upsert=True,
+        return_document=ReturnDocument.AFTER
     )
 
-    updated_goal = await db.goals.find_one({"userId": goal_data.userId})
+    # Drop the agent's cached goals so it sees the update immediately
+    invalidate_goals_cache(goal_data.userId)
+
     return serialize(updated_goal)
 
 
@@ -65,7 +82,7 @@ async def manage_goals(request: Request, goals_req: ManageGoalsRequest = Body(..
     user_id = goals_req.userId
     goals_text = goals_req.goals
 
-    print(f"📝 Managing goals for user: {user_id}")
+    logger.debug("📝 Managing goals for user: %s", user_id)
 
     # Validate goals text
     if not goals_text or not goals_text.strip():
@@ -78,29 +95,37 @@ async def manage_goals(request: Request, goals_req: ManageGoalsRequest = Body(..
     if len(goals_text) > 1024:
         raise HTTPException(status_code=400, detail="Goals cannot exceed 1024 characters")
 
-    # Upsert goals document
-    result = await db.goals.update_one(
+    # One atomic upsert that returns the resulting document - previously an
+    # update_one plus a readback find_one, with datetime.now() called twice
+    now = datetime.now(timezone.utc)
+    goals_doc = await db.goals.find_one_and_update(
         {"userId": user_id},
         {
             "$set": {
                 "goals": goals_text,
-                "updated_at": datetime.now()
+                "updated_at": now
             },
             "$setOnInsert": {
-                "created_at": datetime.now()
+                "created_at": now
             }
         },
-        upsert=True
+        upsert=True,
+        return_document=ReturnDocument.AFTER
     )
 
-    # Fetch the updated/created goals
-    goals_doc = await db.goals.find_one({"userId": user_id})
-    
-    print(f"✅ Goals {'updated' if result.modified_count > 0 else 'created'} successfully")
-    
+    # Drop the agent's cached goals so it sees the update immediately
+    invalidate_goals_cache(user_id)
+
+    # On insert $setOnInsert and $set stamp the same now, so the stored
+    # created_at and updated_at come back identical (both server-truncated
+    # the same way); comparing either against our local now would never
+    # match BSON's millisecond, tz-naive datetimes
+    action = "created" if goals_doc.get("created_at") == goals_doc.get("updated_at") else "updated"
+    logger.debug("✅ Goals %s successfully", action)
+
     return {
         "status": "success",
-        "message": f"Goals {'updated' if result.modified_count > 0 else 'created'} successfully",
+        "message": f"Goals {action} successfully",
         "goals": serialize(goals_doc)
     }
 
@@ -113,7 +138,7 @@ async def get_goals(request: Request, goals_req: GetGoalsRequest = Body(...)):
     db = request.app.state.db
     user_id = goals_req.userId
 
-    print(f"🔍 Fetching goals for user: {user_id}")
+    logger.debug("🔍 Fetching goals for user: %s", user_id)
 
     # Find goals document
     goals_doc = await db.goals.find_one({"userId": user_id})
@@ -129,8 +154,9 @@ async def get_goals(request: Request, goals_req: GetGoalsRequest = Body(...)):
             }
         }
     
-    print(f"✅ Goals found")
-    
+    logger.debug("✅ Goals found")
+
+
     return {
         "status": "success",
         "goals": serialize(goals_doc)
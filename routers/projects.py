@@ -1,17 +1,26 @@
 from fastapi import APIRouter, Request, Body, HTTPException
-from models import Project, ProjectWithTasks, Task
+from fastapi.responses import ORJSONResponse
+from models import Project
 from utils.helpers import serialize
 from bson import ObjectId
-from typing import List
 
 router = APIRouter()
 
 
-@router.get("/", response_model=List[Project])
+# Read endpoints return ORJSONResponse directly: the documents come straight
+# from Mongo, so re-validating them through a response_model plus FastAPI's
+# jsonable_encoder pass only burns CPU on the hottest routes. serialize()
+# already stringifies the ObjectId and orjson handles datetime natively.
+
+@router.get("/")
 async def list_projects(request: Request):
     db = request.app.state.db
-    cursor = db.projects.find().sort("created_at", -1)
-    return [serialize(doc) async for doc in cursor]
+    # One batched fetch instead of an async-iteration step per document;
+    # batch_size keeps each wire message a sane size if the collection grows
+    docs = await db.projects.find().sort("created_at", -1).batch_size(500).to_list(length=None)
+    for d in docs:
+        d["id"] = str(d.pop("_id"))
+    return ORJSONResponse(docs)
 
 
 @router.post("/", response_model=Project, status_code=201)
@@ -20,11 +29,13 @@ async def create_new_project(request: Request, project: Project = Body(...)):
     project_dict = project.model_dump(exclude={"id"})
     result = await db.projects.insert_one(project_dict)
 
-    new_project = await db.projects.find_one({"_id": result.inserted_id})
-    return serialize(new_project)
+    # We already hold every field plus the generated _id - build the
+    # response locally instead of a find_one readback round trip
+    project_dict["_id"] = result.inserted_id
+    return serialize(project_dict)
 
 
-@router.get("/{project_id}", response_model=ProjectWithTasks)
+@router.get("/{project_id}")
 async def get_project_details(request: Request, project_id: str):
     """
     Get project details along with all associated tasks.
@@ -40,25 +51,30 @@ async def get_project_details(request: Request, project_id: str):
     
     project_data = serialize(project)
     
-    tasks_cursor = db.tasks.find({"project_id": project_id})
-    tasks = [serialize(task) async for task in tasks_cursor]
-    
-    project_with_tasks = {
+    tasks = await db.tasks.find({"project_id": project_id}).batch_size(500).to_list(length=None)
+    for t in tasks:
+        t["id"] = str(t.pop("_id"))
+
+    return ORJSONResponse({
         **project_data,
         "tasks": tasks
-    }
-    
-    return project_with_tasks
+    })
 
 
 @router.get("/{project_id}/stats")
 async def get_project_stats(request: Request, project_id: str):
     """Get statistics about tasks in a project"""
     db = request.app.state.db
-    tasks = await db.tasks.find({"project_id": project_id}).to_list(length=100)
+    # Count server-side with one $group instead of pulling tasks into Python
+    # and scanning the list per status - also drops the old length=100 cap
+    cursor = await db.tasks.aggregate([
+        {"$match": {"project_id": project_id}},
+        {"$group": {"_id": "$status", "n": {"$sum": 1}}}
+    ])
+    counts = {d["_id"]: d["n"] async for d in cursor}
     return {
-        "total_tasks": len(tasks),
-        "completed": len([t for t in tasks if t["status"] == "completed"]),
-        "pending": len([t for t in tasks if t["status"] == "pending"]),
-        "in_progress": len([t for t in tasks if t["status"] == "in_progress"])
+        "total_tasks": sum(counts.values()),
+        "completed": counts.get("completed", 0),
+        "pending": counts.get("pending", 0),
+        "in_progress": counts.get("in_progress", 0)
     }
\ No newline at end of file
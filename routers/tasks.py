@@ -1,13 +1,27 @@
+from cachetools import TTLCache
 from fastapi import APIRouter, Request, Body, HTTPException
-from models import Task, TaskUpdate, UserTaskLink, TaskResponse
+from fastapi.responses import ORJSONResponse
+from models import Task, TaskUpdate, UserTaskLink
 from utils.helpers import serialize
 from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
 from typing import List, Optional, Literal
-from datetime import datetime
+from datetime import datetime, timezone
 from pydantic import BaseModel
 
 router = APIRouter()
 
+# Short-lived cache of get_user_tasks results by userId. Dashboards poll
+# this endpoint, so repeat reads within the TTL hit memory instead of Mongo;
+# every write endpoint in this module invalidates its user. TTLCache expires
+# and evicts internally, so the key space stays bounded.
+_USER_TASKS_CACHE = TTLCache(maxsize=10_000, ttl=5)
+
+
+def _invalidate_user_tasks_cache(user_id: str):
+    """Drop the cached task list for a user. Called on every write."""
+    _USER_TASKS_CACHE.pop(user_id, None)
+
 
 class TaskCommentRequest(BaseModel):
     """Request model for saving task comments"""
@@ -17,64 +31,101 @@ class TaskCommentRequest(BaseModel):
     commentBy: Optional[Literal["user", "admin"]] = "user"
 
 
+class TaskSequenceUpdate(BaseModel):
+    """One taskId -> sequenceId pair in a rearrange request"""
+    taskId: str
+    sequenceId: int
+
+
+class RearrangeTasksRequest(BaseModel):
+    """Request model for reordering a user's tasks"""
+    userId: str
+    tasks: List[TaskSequenceUpdate]
+
+
+class DeleteUserTaskRequest(BaseModel):
+    """Request model for removing a task assignment"""
+    userId: str
+    taskId: str
+
+
+class TaskCompletionRequest(BaseModel):
+    """Request model for updating a task's completion status"""
+    userId: str
+    taskId: str
+    isCompleted: bool
+
+
 @router.post("/", response_model=Task, status_code=201)
 async def create_task(request: Request, task: Task = Body(...)):
     db = request.app.state.db
     task_dict = task.model_dump(exclude={"id"})
     result = await db.tasks.insert_one(task_dict)
 
-    new_task = await db.tasks.find_one({"_id": result.inserted_id})
-    return serialize(new_task)
+    # We already hold every field plus the generated _id - build the
+    # response locally instead of a find_one readback round trip
+    task_dict["_id"] = result.inserted_id
+    return serialize(task_dict)
 
 
-@router.get("/user/{user_id}", response_model=List[TaskResponse])
+@router.get("/user/{user_id}")
 async def get_user_tasks(request: Request, user_id: str):
     """
     Get all tasks assigned to a user from the assignments collection.
     """
     db = request.app.state.db
-    
-    # Get user's assignment document
-    assignment = await db.assignments.find_one({"userId": user_id})
-    
-    if not assignment or not assignment.get("tasks"):
-        return []
-    
-    response_tasks = []
-    
-    for task_assignment in assignment["tasks"]:
-        task_id = task_assignment["taskId"]
-        
-        # Validate ObjectId
-        if not ObjectId.is_valid(task_id):
-            continue
-        
-        # Fetch task details
-        task = await db.tasks.find_one({"_id": ObjectId(task_id)})
-        if not task:
-            continue
-        
-        # Fetch project details
-        project = await db.projects.find_one({"_id": ObjectId(task["project_id"])})
-        if not project:
-            continue
-        
-        # Build response
-        task_response = TaskResponse(
-            taskId=task_id,
-            name=task.get("title", ""),
-            description=task.get("description"),
-            projectId=task["project_id"],
-            projectName=project.get("name", ""),
-            assignedBy=task_assignment.get("assignedBy", "admin"),
-            sequenceId=task_assignment.get("sequenceId"),
-            isCompleted=task_assignment.get("isCompleted", False),
-            comments=task_assignment.get("comments", [])
-        )
-        
-        response_tasks.append(task_response)
-    
-    return response_tasks
+
+    cached = _USER_TASKS_CACHE.get(user_id)
+    if cached is not None:
+        return ORJSONResponse(cached)
+
+    # One aggregation that joins assignments -> tasks -> projects server-side,
+    # replacing the former per-task find_one pair (2N+1 round trips for N
+    # assigned tasks). The $unwinds drop rows whose task or project is
+    # missing, matching the old loop's continue-on-miss behaviour.
+    pipeline = [
+        {"$match": {"userId": user_id}},
+        {"$unwind": "$tasks"},
+        # $convert with onError keeps malformed taskIds from aborting the
+        # pipeline - they produce a null join key and fall out at $unwind,
+        # like the old ObjectId.is_valid guard
+        {"$addFields": {"_tid": {"$convert": {
+            "input": "$tasks.taskId", "to": "objectId", "onError": None
+        }}}},
+        {"$lookup": {
+            "from": "tasks",
+            "localField": "_tid",
+            "foreignField": "_id",
+            "as": "task"
+        }},
+        {"$unwind": "$task"},
+        {"$addFields": {"_pid": {"$convert": {
+            "input": "$task.project_id", "to": "objectId", "onError": None
+        }}}},
+        {"$lookup": {
+            "from": "projects",
+            "localField": "_pid",
+            "foreignField": "_id",
+            "as": "project"
+        }},
+        {"$unwind": "$project"},
+        {"$project": {
+            "_id": 0,
+            "taskId": "$tasks.taskId",
+            "name": {"$ifNull": ["$task.title", ""]},
+            "description": "$task.description",
+            "projectId": "$task.project_id",
+            "projectName": {"$ifNull": ["$project.name", ""]},
+            "assignedBy": {"$ifNull": ["$tasks.assignedBy", "admin"]},
+            "sequenceId": "$tasks.sequenceId",
+            "isCompleted": {"$ifNull": ["$tasks.isCompleted", False]},
+            "comments": {"$ifNull": ["$tasks.comments", []]}
+        }}
+    ]
+    cursor = await db.assignments.aggregate(pipeline)
+    response_tasks = await cursor.to_list(length=None)
+    _USER_TASKS_CACHE[user_id] = response_tasks
+    return ORJSONResponse(response_tasks)
 
 
 @router.put("/{task_id}", response_model=Task)
@@ -82,11 +133,20 @@ async def update_task_status(request: Request, task_id: str, update: TaskUpdate)
     db = request.app.state.db
     if not ObjectId.is_valid(task_id):
         raise HTTPException(status_code=400, detail="Invalid Task ID")
+    oid = ObjectId(task_id)
 
-    update_data = {k: v for k, v in update.model_dump().items() if v is not None}
-    await db.tasks.update_one({"_id": ObjectId(task_id)}, {"$set": update_data})
-
-    updated = await db.tasks.find_one({"_id": ObjectId(task_id)})
+    # exclude_none drops unset fields inside Pydantic's Rust dump instead of
+    # materializing the full dict and filtering it in Python
+    update_data = update.model_dump(exclude_none=True)
+    # One atomic update that returns the resulting document - saves the
+    # readback find_one round trip
+    updated = await db.tasks.find_one_and_update(
+        {"_id": oid},
+        {"$set": update_data},
+        return_document=ReturnDocument.AFTER
+    )
+    if not updated:
+        raise HTTPException(status_code=404, detail="Task not found")
     return serialize(updated)
 
 
@@ -102,11 +162,6 @@ async def link_user_to_task(request: Request, payload: UserTaskLink = Body(...))
     if not ObjectId.is_valid(payload.taskId):
         raise HTTPException(status_code=400, detail="Invalid taskId format")
     
-    # Verify task exists
-    task = await db.tasks.find_one({"_id": ObjectId(payload.taskId)})
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
-    
     # Create task assignment object
     task_assignment = {
         "taskId": payload.taskId,
@@ -115,22 +170,80 @@ async def link_user_to_task(request: Request, payload: UserTaskLink = Body(...))
         "isCompleted": False,
         "comments": []
     }
-    
-    # Update or create assignment document
-    result = await db.assignments.update_one(
+
+    # Verify the task exists before writing anything - a 404 must leave the
+    # assignments collection untouched. The check only needs _id back.
+    task = await db.tasks.find_one({"_id": ObjectId(payload.taskId)}, {"_id": 1})
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    # The pipeline update dedupes on taskId alone: $addToSet compared whole
+    # subdocuments, so the same task with a different sequenceId or assigner
+    # used to be appended twice.
+    await db.assignments.update_one(
         {"userId": payload.userId},
-        {
-            "$addToSet": {"tasks": task_assignment}
-        },
+        [{"$set": {"tasks": {"$cond": [
+            {"$in": [payload.taskId, {"$ifNull": ["$tasks.taskId", []]}]},
+            "$tasks",
+            {"$concatArrays": [{"$ifNull": ["$tasks", []]}, [task_assignment]]}
+        ]}}}],
         upsert=True
     )
-    
+
+    _invalidate_user_tasks_cache(payload.userId)
+
     return {
-        "status": "success", 
+        "status": "success",
         "message": f"Task {payload.taskId} assigned to user {payload.userId}"
     }
 
 
+@router.post("/user-tasks/bulk", status_code=201)
+async def link_user_to_tasks_bulk(request: Request, payloads: List[UserTaskLink] = Body(...)):
+    """
+    Assign a batch of tasks in one request. When the agent suggests several
+    tasks at once, posting them individually costs N HTTP round trips and N
+    Mongo updates; one bulk_write amortises that to a single round trip.
+    """
+    db = request.app.state.db
+
+    if not payloads:
+        raise HTTPException(status_code=400, detail="At least one assignment is required")
+
+    invalid = [p.taskId for p in payloads if not ObjectId.is_valid(p.taskId)]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Invalid taskId format: {invalid}")
+
+    # Same taskId-keyed dedupe as the single-assignment endpoint
+    ops = [
+        UpdateOne(
+            {"userId": p.userId},
+            [{"$set": {"tasks": {"$cond": [
+                {"$in": [p.taskId, {"$ifNull": ["$tasks.taskId", []]}]},
+                "$tasks",
+                {"$concatArrays": [{"$ifNull": ["$tasks", []]}, [{
+                    "taskId": p.taskId,
+                    "assignedBy": p.assignedBy,
+                    "sequenceId": p.sequenceId,
+                    "isCompleted": False,
+                    "comments": []
+                }]]}
+            ]}}}],
+            upsert=True
+        )
+        for p in payloads
+    ]
+    await db.assignments.bulk_write(ops, ordered=False)
+
+    for p in payloads:
+        _invalidate_user_tasks_cache(p.userId)
+
+    return {
+        "status": "success",
+        "message": f"{len(ops)} task assignment(s) applied"
+    }
+
+
 @router.put("/user-tasks/{user_id}/{task_id}", status_code=200)
 async def update_user_task_assignment(
     request: Request, 
@@ -155,69 +268,66 @@ async def update_user_task_assignment(
     if sequenceId is not None:
         update_fields["tasks.$[elem].sequenceId"] = sequenceId
     
-    # Add comment if provided
+    # $set and $push coexist in one update document, so the field updates
+    # and the optional comment go out as a single command. The filter
+    # carries the task-membership check - a miss is matched_count == 0.
+    update_doc = {}
+    if update_fields:
+        update_doc["$set"] = update_fields
     if comment and commentBy:
-        new_comment = {
-            "comment": comment,
-            "commentBy": commentBy,
-            "createdAt": datetime.now()
+        update_doc["$push"] = {
+            "tasks.$[elem].comments": {
+                "comment": comment,
+                "commentBy": commentBy,
+                "createdAt": datetime.now(timezone.utc)
+            }
         }
-        await db.assignments.update_one(
-            {"userId": user_id},
-            {"$push": {"tasks.$[elem].comments": new_comment}},
-            array_filters=[{"elem.taskId": task_id}]
-        )
-    
-    # Update other fields if any
-    if update_fields:
+
+    if update_doc:
         result = await db.assignments.update_one(
-            {"userId": user_id},
-            {"$set": update_fields},
+            {"userId": user_id, "tasks.taskId": task_id},
+            update_doc,
             array_filters=[{"elem.taskId": task_id}]
         )
-        
+
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Assignment not found")
-    
+
+        _invalidate_user_tasks_cache(user_id)
+
     return {"status": "success", "message": "Assignment updated"}
 
 @router.post("/rearrange-user-tasks", status_code=200)
-async def rearrange_user_tasks(request: Request, payload: dict = Body(...)):
+async def rearrange_user_tasks(request: Request, payload: RearrangeTasksRequest = Body(...)):
     """
     Rearrange tasks for a user by updating their sequenceId values.
     Accepts a list of tasks with updated sequenceIds.
     """
     db = request.app.state.db
-    
-    user_id = payload.get("userId")
-    tasks = payload.get("tasks", [])
-    
-    if not user_id:
-        raise HTTPException(status_code=400, detail="userId is required")
-    
-    if not tasks:
-        raise HTTPException(status_code=400, detail="tasks array is required")
-    
-    # Verify user assignment exists
-    assignment = await db.assignments.find_one({"userId": user_id})
-    if not assignment:
-        raise HTTPException(status_code=404, detail="No assignments found for this user")
-    
-    # Update sequenceId for each task
-    for task_update in tasks:
-        task_id = task_update.get("taskId")
-        sequence_id = task_update.get("sequenceId")
-        
-        if not task_id or sequence_id is None:
-            continue
-        
-        # Update the sequenceId for the specific task in the array
-        await db.assignments.update_one(
+
+    user_id = payload.userId
+
+    # One unordered bulk_write carrying every sequence update instead of a
+    # serially awaited update_one per task; its matched_count doubles as the
+    # existence check, so the old verify find_one is gone too
+    ops = [
+        UpdateOne(
             {"userId": user_id},
-            {"$set": {"tasks.$[elem].sequenceId": sequence_id}},
-            array_filters=[{"elem.taskId": task_id}]
+            {"$set": {"tasks.$[elem].sequenceId": t.sequenceId}},
+            array_filters=[{"elem.taskId": t.taskId}]
         )
-    
+        for t in payload.tasks
+    ]
+
+    if not ops:
+        raise HTTPException(status_code=400, detail="tasks array is required")
+
+    result = await db.assignments.bulk_write(ops, ordered=False)
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="No assignments found for this user")
+
+    _invalidate_user_tasks_cache(user_id)
+
     return {
         "status": "success",
         "message": f"Task order updated for user {user_id}"
@@ -225,39 +335,38 @@ async def rearrange_user_tasks(request: Request, payload: dict = Body(...)):
 
 
 @router.post("/delete-user-task", status_code=200)
-async def delete_user_task(request: Request, payload: dict = Body(...)):
+async def delete_user_task(request: Request, payload: DeleteUserTaskRequest = Body(...)):
     """
     Delete a task assignment from a user's task list.
     Removes the task from the assignments collection.
     """
     db = request.app.state.db
-    
-    user_id = payload.get("userId")
-    task_id = payload.get("taskId")
-    
-    if not user_id:
-        raise HTTPException(status_code=400, detail="userId is required")
-    
-    if not task_id:
-        raise HTTPException(status_code=400, detail="taskId is required")
-    
-    # Verify user assignment exists
-    assignment = await db.assignments.find_one({"userId": user_id})
-    if not assignment:
-        raise HTTPException(status_code=404, detail="No assignments found for this user")
-    
-    # Remove the task from the user's tasks array
+
+    user_id = payload.userId
+    task_id = payload.taskId
+
+    # One $pull whose filter carries the task-membership check - no verify
+    # find_one round trip; a miss surfaces as matched_count == 0
     result = await db.assignments.update_one(
-        {"userId": user_id},
+        {"userId": user_id, "tasks.taskId": task_id},
         {"$pull": {"tasks": {"taskId": task_id}}}
     )
-    
-    if result.modified_count == 0:
+
+    if result.matched_count == 0:
+        # Only on the error path: one cheap existence count to tell a
+        # missing assignment document apart from a missing task entry
+        has_assignment = await db.assignments.count_documents(
+            {"userId": user_id}, limit=1
+        )
+        if not has_assignment:
+            raise HTTPException(status_code=404, detail="No assignments found for this user")
         raise HTTPException(
-            status_code=404, 
+            status_code=404,
             detail=f"Task {task_id} not found in user's assignments"
         )
-    
+
+    _invalidate_user_tasks_cache(user_id)
+
     return {
         "status": "success",
         "message": f"Task {task_id} deleted from user {user_id}'s assignments"
@@ -282,39 +391,36 @@ async def save_task_comment(request: Request, payload: TaskCommentRequest = Body
     if not payload.comment.strip():
         raise HTTPException(status_code=400, detail="comment cannot be empty")
     
-    # Verify user assignment exists
-    assignment = await db.assignments.find_one({"userId": payload.userId})
-    if not assignment:
-        raise HTTPException(status_code=404, detail="No assignments found for this user")
-    
-    # Verify task exists in user's assignments
-    task_found = any(task.get("taskId") == payload.taskId for task in assignment.get("tasks", []))
-    if not task_found:
-        raise HTTPException(
-            status_code=404, 
-            detail=f"Task {payload.taskId} not found in user's assignments"
-        )
-    
     # Create comment object
     new_comment = {
         "comment": payload.comment.strip(),
         "commentBy": payload.commentBy,
-        "createdAt": datetime.now()
+        "createdAt": datetime.now(timezone.utc)
     }
-    
-    # Add comment to the task's comments array
+
+    # One update whose filter carries the user + task-membership check,
+    # replacing the verify find_one and the Python any() scan over the array
     result = await db.assignments.update_one(
-        {"userId": payload.userId},
+        {"userId": payload.userId, "tasks.taskId": payload.taskId},
         {"$push": {"tasks.$[elem].comments": new_comment}},
         array_filters=[{"elem.taskId": payload.taskId}]
     )
-    
-    if result.modified_count == 0:
+
+    if result.matched_count == 0:
+        # Only on the error path: one cheap existence count to tell a
+        # missing assignment document apart from a missing task entry
+        has_assignment = await db.assignments.count_documents(
+            {"userId": payload.userId}, limit=1
+        )
+        if not has_assignment:
+            raise HTTPException(status_code=404, detail="No assignments found for this user")
         raise HTTPException(
-            status_code=500, 
-            detail="Failed to save comment"
+            status_code=404,
+            detail=f"Task {payload.taskId} not found in user's assignments"
         )
     
+    _invalidate_user_tasks_cache(payload.userId)
+
     return {
         "status": "success",
         "message": "Comment saved successfully",
@@ -323,57 +429,44 @@ async def save_task_comment(request: Request, payload: TaskCommentRequest = Body
 
 
 @router.post("/update-task-completion-status", status_code=200)
-async def update_task_completion_status(request: Request, payload: dict = Body(...)):
+async def update_task_completion_status(request: Request, payload: TaskCompletionRequest = Body(...)):
     """
     Update the completion status of a task in the assignments collection.
-    
+
     Request body:
     - userId: str (required) - The ID of the user
     - taskId: str (required) - The ID of the task
     - isCompleted: bool (required) - The completion status (true for completed, false for pending)
     """
     db = request.app.state.db
-    
-    user_id = payload.get("userId")
-    task_id = payload.get("taskId")
-    is_completed = payload.get("isCompleted")
-    
-    # Validate required fields
-    if not user_id:
-        raise HTTPException(status_code=400, detail="userId is required")
-    
-    if not task_id:
-        raise HTTPException(status_code=400, detail="taskId is required")
-    
-    if is_completed is None:
-        raise HTTPException(status_code=400, detail="isCompleted is required")
-    
-    # Verify user assignment exists
-    assignment = await db.assignments.find_one({"userId": user_id})
-    if not assignment:
-        raise HTTPException(status_code=404, detail="No assignments found for this user")
-    
-    # Verify task exists in user's assignments
-    task_found = any(task.get("taskId") == task_id for task in assignment.get("tasks", []))
-    if not task_found:
-        raise HTTPException(
-            status_code=404, 
-            detail=f"Task {task_id} not found in user's assignments"
-        )
-    
-    # Update the task completion status
+
+    user_id = payload.userId
+    task_id = payload.taskId
+    is_completed = payload.isCompleted
+
+    # One update whose filter carries the user + task-membership check,
+    # replacing the verify find_one and the Python any() scan over the array
     result = await db.assignments.update_one(
-        {"userId": user_id},
+        {"userId": user_id, "tasks.taskId": task_id},
         {"$set": {"tasks.$[elem].isCompleted": is_completed}},
         array_filters=[{"elem.taskId": task_id}]
     )
-    
-    if result.modified_count == 0:
+
+    if result.matched_count == 0:
+        # Only on the error path: one cheap existence count to tell a
+        # missing assignment document apart from a missing task entry
+        has_assignment = await db.assignments.count_documents(
+            {"userId": user_id}, limit=1
+        )
+        if not has_assignment:
+            raise HTTPException(status_code=404, detail="No assignments found for this user")
         raise HTTPException(
-            status_code=500, 
-            detail="Failed to update task completion status"
+            status_code=404,
+            detail=f"Task {task_id} not found in user's assignments"
         )
-    
+
+    _invalidate_user_tasks_cache(user_id)
+
     return {
         "status": "success",
         "message": f"Task completion status updated to {'completed' if is_completed else 'pending'}",